@@ -47,14 +47,20 @@ def _engine_options(database_url: str) -> tuple[str, dict]:
 
 
 database_url, connect_args = _engine_options(settings.database_url)
+connect_args.update(
+    statement_cache_size=settings.db_statement_cache_size,
+    prepared_statement_cache_size=settings.db_prepared_statement_cache_size,
+)
 
 # Create async engine
 engine = create_async_engine(
     database_url,
     echo=not settings.is_production,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_recycle=settings.db_pool_recycle,
+    pool_timeout=settings.db_pool_timeout,
     connect_args=connect_args,
 )
 
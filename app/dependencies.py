@@ -3,11 +3,16 @@ FastAPI dependencies for authentication and authorization.
 """
 
 import logging
+from dataclasses import dataclass
 from typing import Dict, Optional
 
 from fastapi import Depends, Header, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import Insert, Select, insert, literal, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, raiseload
+from uuid_utils.compat import uuid7
 
 from app.db.database import get_db
 from app.models.subscription import Subscription
@@ -17,6 +22,59 @@ from app.services.cognito import cognito_service
 logger = logging.getLogger(__name__)
 
 
+def _create_user_with_subscription(cognito_id: str, email: str) -> Insert:
+    """
+    Build the first-login INSERT for a user and their default subscription.
+    
+    Both rows are written by one statement: the user insert runs in a CTE
+    and the subscription is inserted from its RETURNING id. ON CONFLICT
+    covers two concurrent first requests for the same cognito_id; the
+    loser inserts nothing and re-reads the winner's row.
+    """
+    new_user = (
+        pg_insert(User)
+        .values(id=str(uuid7()), cognito_id=cognito_id, email=email, role="subscriber")
+        .on_conflict_do_nothing(index_elements=[User.cognito_id])
+        .returning(User.id)
+        .cte("new_user")
+    )
+    # BETA: Auto-grant premium access to all new users
+    # TODO: Change back to plan="free" after beta ends
+    return insert(Subscription).from_select(
+        [Subscription.id, Subscription.user_id, Subscription.plan, Subscription.status],
+        select(
+            literal(str(uuid7()), UUID(as_uuid=False)),
+            new_user.c.id,
+            literal("premium"),
+            literal("active"),
+        ),
+    )
+
+
+def _select_auth_context(cognito_id: str) -> Select:
+    """
+    Build the single-query lookup for a user and their subscription.
+    
+    The subscription is outer-joined and also populated onto
+    user.subscription. coupon_redemptions is never read on authenticated
+    requests, so its selectin load is suppressed.
+    """
+    return (
+        select(User, Subscription)
+        .outerjoin(User.subscription)
+        .options(contains_eager(User.subscription), raiseload(User.coupon_redemptions))
+        .where(User.cognito_id == cognito_id)
+    )
+
+
+@dataclass
+class AuthContext:
+    """Authenticated user and their subscription, loaded together."""
+
+    user: User
+    subscription: Optional[Subscription]
+
+
 async def get_current_user(
     authorization: str = Header(..., description="Bearer token"),
 ) -> Dict[str, str]:
@@ -56,7 +114,7 @@ async def get_current_user(
         user_info = await cognito_service.get_user_info(token)
         return user_info
     except ValueError as e:
-        logger.warning(f"Token validation failed: {e}")
+        logger.warning("Token validation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=str(e),
@@ -64,12 +122,12 @@ async def get_current_user(
         )
 
 
-async def get_current_user_with_db(
+async def load_auth_context(
     user_info: Dict[str, str] = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
-) -> User:
+) -> AuthContext:
     """
-    Get the current authenticated user from the database.
+    Load the current user and subscription from the database in one query.
     
     Creates the user record if it doesn't exist (first login).
     
@@ -78,7 +136,7 @@ async def get_current_user_with_db(
         db: Database session.
         
     Returns:
-        User model instance.
+        AuthContext with the User and its Subscription (if any).
         
     Raises:
         HTTPException(401): If authentication fails.
@@ -87,48 +145,53 @@ async def get_current_user_with_db(
     email = user_info["email"]
     
     # Try to find existing user
-    result = await db.execute(
-        select(User).where(User.cognito_id == cognito_id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if not user:
-        # Create new user on first login
-        user = User(
-            cognito_id=cognito_id,
-            email=email,
-            role="subscriber",
-        )
-        db.add(user)
-        await db.flush()  # Generate user.id before creating subscription
+    row = (await db.execute(_select_auth_context(cognito_id))).first()
+    
+    if row is None:
+        # Create user + default subscription in one round trip
+        await db.execute(_create_user_with_subscription(cognito_id, email))
+        await db.commit()
+
+        row = (await db.execute(_select_auth_context(cognito_id))).one()
+        logger.info("Created new user: %s", email)
+    
+    return AuthContext(user=row.User, subscription=row.Subscription)
+
+
+async def get_current_user_with_db(
+    ctx: AuthContext = Depends(load_auth_context),
+) -> User:
+    """
+    Get the current authenticated user from the database.
+    
+    Args:
+        ctx: Auth context for the current request.
         
-        # Create default subscription
-        # BETA: Auto-grant premium access to all new users
-        # TODO: Change back to plan="free" after beta ends
-        subscription = Subscription(
-            user_id=user.id,
-            plan="premium",
-            status="active",
+    Returns:
+        User model instance, with user.subscription already loaded.
+    """
+    return ctx.user
+
+
+def _subscription_or_404(ctx: AuthContext) -> Subscription:
+    """Return the context's subscription or raise 404 if the user has none."""
+    if not ctx.subscription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Subscription not found",
         )
-        db.add(subscription)
-        
-        await db.commit()
-        await db.refresh(user)
-        logger.info(f"Created new user: {email}")
     
-    return user
+    return ctx.subscription
 
 
 async def get_subscription(
-    user: User = Depends(get_current_user_with_db),
-    db: AsyncSession = Depends(get_db),
+    ctx: AuthContext = Depends(load_auth_context),
 ) -> Subscription:
     """
     Get the current user's subscription.
     
     Args:
-        user: Current authenticated user.
-        db: Database session.
+        ctx: Auth context for the current request.
         
     Returns:
         Subscription model instance.
@@ -136,43 +199,40 @@ async def get_subscription(
     Raises:
         HTTPException(404): If subscription not found.
     """
-    result = await db.execute(
-        select(Subscription).where(Subscription.user_id == user.id)
-    )
-    subscription = result.scalar_one_or_none()
-    
-    if not subscription:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Subscription not found",
-        )
-    
-    return subscription
+    return _subscription_or_404(ctx)
 
 
 def require_plan(required_plans: list[str]):
     """
     Dependency factory that requires specific subscription plans.
     
+    The returned check reads the per-request AuthContext directly, so a
+    plan-gated endpoint resolves exactly one auth dependency.
+    
     Args:
         required_plans: List of plan names that are allowed.
         
     Returns:
         Dependency function that validates the user's plan.
     """
+    allowed_plans = frozenset(required_plans)
+    plan_detail = f"This feature requires one of these plans: {', '.join(required_plans)}"
+    
     async def check_plan(
-        subscription: Subscription = Depends(get_subscription),
+        ctx: AuthContext = Depends(load_auth_context),
     ) -> Subscription:
+        subscription = _subscription_or_404(ctx)
+        
         if not subscription.is_active:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Subscription is not active",
             )
         
-        if subscription.plan not in required_plans:
+        if subscription.plan not in allowed_plans:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"This feature requires one of these plans: {', '.join(required_plans)}",
+                detail=plan_detail,
             )
         
         return subscription
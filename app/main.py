@@ -8,31 +8,27 @@ NBA predictions platform backend with:
 - PostgreSQL user/subscription database
 """
 
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-from app.config import get_settings
+from app.config import settings
 from app.db.database import engine
 from app.models.page_view import PageView
-from app.routers import (
-    analytics_router,
-    auth_router,
-    billing_router,
-    health_router,
-    meta_router,
-    predictions_router,
-    webhooks_router,
-)
+from app.routers import root_router
 from app.services.cognito import cognito_service
+from app.services.prediction_service import prediction_service
+from app.services.redis_client import close_redis
 from app.services.report_scheduler import daily_report_loop
 
 # Configure logging
 logging.basicConfig(
-    level=logging.INFO,
+    level=settings.log_level.upper(),
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
 )
 logger = logging.getLogger(__name__)
@@ -47,19 +43,18 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     - Startup: Log configuration, verify connections
     - Shutdown: Clean up resources
     """
-    settings = get_settings()
-
     # Startup
-    logger.info(f"Starting Predictium API ({settings.app_env})")
-    logger.info(f"CORS origins: {settings.cors_origins}")
+    logger.info("Starting Predictium API (%s)", settings.app_env)
+    logger.info("CORS origins: %s", cors_origins)
+    await cognito_service.start()
+    await prediction_service.start()
+    refresh_task = asyncio.create_task(prediction_service.refresh_latest_loop())
 
     # Ensure the analytics table exists (idempotent; canonical DDL also lives
     # in Predictium_Front_End/database/migrations/006_page_views.sql)
     report_task = None
     if settings.analytics_ingest_key:
         try:
-            import asyncio
-
             async with engine.begin() as conn:
                 await conn.run_sync(
                     PageView.metadata.create_all, tables=[PageView.__table__]
@@ -72,40 +67,38 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 
     # Shutdown
     logger.info("Shutting down Predictium API")
+    refresh_task.cancel()
     if report_task:
         report_task.cancel()
     await cognito_service.close()
+    await prediction_service.close()
+    await close_redis()
 
 
 # Create FastAPI app
-settings = get_settings()
-
 app = FastAPI(
     title="Predictium API",
     description="NBA predictions platform backend",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs" if not settings.is_production else None,
     redoc_url="/redoc" if not settings.is_production else None,
+    openapi_url="/openapi.json" if not settings.is_production else None,
 )
 
-# Configure CORS
+# Configure CORS (parsed once; also logged at startup)
+cors_origins = settings.cors_origins
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins,
+    allow_origins=cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
 # Include routers
-app.include_router(health_router)
-app.include_router(meta_router)
-app.include_router(auth_router)
-app.include_router(predictions_router)
-app.include_router(billing_router)
-app.include_router(webhooks_router)
-app.include_router(analytics_router)
+app.include_router(root_router)
 
 
 @app.get("/")
@@ -1,12 +1,24 @@
 """Coupon and CouponRedemption SQLAlchemy models."""
 
-import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import (
+    Boolean,
+    ColumnElement,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    and_,
+    func,
+    or_,
+    text,
+)
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from uuid_utils.compat import uuid7
 
 from app.db.database import Base
 
@@ -77,8 +89,8 @@ class Coupon(Base):
         server_default=func.now(),
         nullable=False,
     )
-    created_by: Mapped[Optional[uuid.UUID]] = mapped_column(
-        UUID(as_uuid=True),
+    created_by: Mapped[Optional[str]] = mapped_column(
+        UUID(as_uuid=False),
         ForeignKey("users.id"),
         nullable=True,
     )
@@ -90,9 +102,29 @@ class Coupon(Base):
         lazy="selectin",
     )
 
+    __table_args__ = (
+        # Serves "currently valid coupon" scans without touching inactive
+        # rows; created by database/migrations/007_coupons_active_valid_index.sql
+        Index(
+            "ix_coupons_active_valid",
+            "expires_at",
+            postgresql_where=text("is_active = true"),
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<Coupon {self.code} ({self.plan})>"
 
+    @classmethod
+    def valid_filter(cls) -> ColumnElement[bool]:
+        """SQL equivalent of is_valid, for filtering coupons in the database."""
+        return and_(
+            cls.is_active.is_(True),
+            or_(cls.expires_at.is_(None), cls.expires_at > func.now()),
+            # NULL or 0 max_uses means unlimited, matching is_valid
+            or_(func.coalesce(cls.max_uses, 0) == 0, cls.current_uses < cls.max_uses),
+        )
+
     @property
     def is_valid(self) -> bool:
         """Check if the coupon is currently valid for redemption."""
@@ -120,13 +152,13 @@ class CouponRedemption(Base):
 
     __tablename__ = "coupon_redemptions"
 
-    id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True),
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
         primary_key=True,
-        default=uuid.uuid4,
+        default=lambda: str(uuid7()),
     )
-    user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True),
+    user_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
         ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False,
         index=True,
@@ -153,5 +185,17 @@ class CouponRedemption(Base):
         back_populates="redemptions",
     )
 
+    __table_args__ = (
+        # One redemption per user per coupon; target of ON CONFLICT in
+        # redeem_coupon. Created by
+        # database/migrations/006_coupon_redemption_unique.sql
+        Index(
+            "ix_coupon_redemption_user_code",
+            "user_id",
+            "coupon_code",
+            unique=True,
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<CouponRedemption {self.coupon_code} by {self.user_id}>"
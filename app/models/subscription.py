@@ -1,12 +1,12 @@
 """Subscription SQLAlchemy model."""
 
-import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, Optional
 
 from sqlalchemy import DateTime, ForeignKey, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from uuid_utils.compat import uuid7
 
 from app.db.database import Base
 
@@ -35,13 +35,16 @@ class Subscription(Base):
 
     __tablename__ = "subscriptions"
 
-    id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True),
+    ACTIVE_STATUSES = ("trialing", "active")
+    PREMIUM_PLANS = ("premium", "pro_weekly", "pro_monthly", "pro_season")
+
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
         primary_key=True,
-        default=uuid.uuid4,
+        default=lambda: str(uuid7()),
     )
-    user_id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True),
+    user_id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
         ForeignKey("users.id", ondelete="CASCADE"),
         unique=True,
         nullable=False,
@@ -99,12 +102,12 @@ class Subscription(Base):
     @property
     def is_active(self) -> bool:
         """Check if the subscription is currently active."""
-        return self.status in ("trialing", "active")
+        return self.status in self.ACTIVE_STATUSES
 
     @property
     def has_premium_access(self) -> bool:
         """Check if user has Premium access (any pro plan or legacy premium)."""
-        return self.is_active and self.plan in ("premium", "pro_weekly", "pro_monthly", "pro_season")
+        return self.is_active and self.plan in self.PREMIUM_PLANS
 
     @property
     def has_data_api_access(self) -> bool:
@@ -1,12 +1,12 @@
 """User SQLAlchemy model."""
 
-import uuid
 from datetime import datetime
 from typing import TYPE_CHECKING, List
 
 from sqlalchemy import DateTime, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from uuid_utils.compat import uuid7
 
 from app.db.database import Base
 
@@ -30,10 +30,10 @@ class User(Base):
 
     __tablename__ = "users"
 
-    id: Mapped[uuid.UUID] = mapped_column(
-        UUID(as_uuid=True),
+    id: Mapped[str] = mapped_column(
+        UUID(as_uuid=False),
         primary_key=True,
-        default=uuid.uuid4,
+        default=lambda: str(uuid7()),
     )
     cognito_id: Mapped[str] = mapped_column(
         String,
@@ -69,7 +69,7 @@ class User(Base):
         "Subscription",
         back_populates="user",
         uselist=False,
-        lazy="selectin",
+        lazy="joined",
     )
     coupon_redemptions: Mapped[List["CouponRedemption"]] = relationship(
         "CouponRedemption",
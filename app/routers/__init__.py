@@ -1,5 +1,7 @@
 """API routers for Predictium."""
 
+from fastapi import APIRouter
+
 from app.routers.analytics import router as analytics_router
 from app.routers.auth import router as auth_router
 from app.routers.billing import router as billing_router
@@ -8,6 +10,16 @@ from app.routers.meta import router as meta_router
 from app.routers.predictions import router as predictions_router
 from app.routers.webhooks import router as webhooks_router
 
+# Single parent router so the app mounts every route table in one pass
+root_router = APIRouter()
+root_router.include_router(health_router)
+root_router.include_router(meta_router)
+root_router.include_router(auth_router)
+root_router.include_router(predictions_router)
+root_router.include_router(billing_router)
+root_router.include_router(webhooks_router)
+root_router.include_router(analytics_router)
+
 __all__ = [
     "analytics_router",
     "auth_router",
@@ -15,5 +27,6 @@ __all__ = [
     "health_router",
     "meta_router",
     "predictions_router",
+    "root_router",
     "webhooks_router",
 ]
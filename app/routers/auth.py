@@ -1,10 +1,10 @@
 """Authentication endpoints."""
 
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Optional
 
 from fastapi import APIRouter, Depends
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 from app.dependencies import get_current_user_with_db
 from app.models.user import User
@@ -15,6 +15,8 @@ router = APIRouter(prefix="/auth", tags=["Auth"])
 class SubscriptionInfo(BaseModel):
     """Subscription information in user response."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     plan: str
     status: str
     is_active: bool
@@ -26,6 +28,8 @@ class SubscriptionInfo(BaseModel):
 class UserResponse(BaseModel):
     """Response model for /auth/me endpoint."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     id: str
     email: str
     role: str
@@ -33,10 +37,14 @@ class UserResponse(BaseModel):
     subscription: Optional[SubscriptionInfo] = None
 
 
-@router.get("/me", response_model=UserResponse)
+@router.get(
+    "/me",
+    response_model=None,
+    responses={200: {"model": UserResponse}},
+)
 async def get_current_user_info(
     user: User = Depends(get_current_user_with_db),
-) -> Dict[str, Any]:
+) -> UserResponse:
     """
     Get current user information.
     
@@ -47,21 +55,23 @@ async def get_current_user_info(
     Returns:
         UserResponse with user profile and subscription info.
     """
-    response: Dict[str, Any] = {
-        "id": str(user.id),
-        "email": user.email,
-        "role": user.role,
-        "created_at": user.created_at,
-    }
-    
+    # Values come straight from the ORM, so skip validation and let
+    # FastAPI serialize the model once (response_model=None).
+    subscription = None
     if user.subscription:
-        response["subscription"] = {
-            "plan": user.subscription.plan,
-            "status": user.subscription.status,
-            "is_active": user.subscription.is_active,
-            "has_premium_access": user.subscription.has_premium_access,
-            "trial_ends_at": user.subscription.trial_ends_at,
-            "current_period_end": user.subscription.current_period_end,
-        }
+        subscription = SubscriptionInfo.model_construct(
+            plan=user.subscription.plan,
+            status=user.subscription.status,
+            is_active=user.subscription.is_active,
+            has_premium_access=user.subscription.has_premium_access,
+            trial_ends_at=user.subscription.trial_ends_at,
+            current_period_end=user.subscription.current_period_end,
+        )
     
-    return response
+    return UserResponse.model_construct(
+        id=str(user.id),
+        email=user.email,
+        role=user.role,
+        created_at=user.created_at,
+        subscription=subscription,
+    )
@@ -2,12 +2,14 @@
 
 import logging
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
-from sqlalchemy import select
+from pydantic import BaseModel, ConfigDict
+from sqlalchemy import bindparam, insert, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
 
 from app.config import get_settings
 from app.db.database import get_db
@@ -35,10 +37,70 @@ ONE_TIME_PLANS = {"pro_season"}
 # Plans eligible for free trial
 TRIAL_ELIGIBLE_PLANS = {"pro_weekly", "pro_monthly"}
 
+# Coupon redemption statements, built once with bound parameters so each
+# request reuses the same statement object and compiled-cache entry.
+# Coupon.redemptions is never read here, so skip its selectin load.
+COUPON_BY_CODE = (
+    select(Coupon)
+    .options(raiseload(Coupon.redemptions))
+    .where(Coupon.code == bindparam("code"))
+)
+
+# The unique (user_id, coupon_code) index turns a repeat redemption,
+# including a concurrent double-submit, into a no-op. The index comes from
+# database/migrations/006_coupon_redemption_unique.sql; ON CONFLICT fails
+# without it, so REDEMPTION_INDEX_READY gates this statement.
+RECORD_REDEMPTION = (
+    pg_insert(CouponRedemption)
+    .values(user_id=bindparam("user_id"), coupon_code=bindparam("code"))
+    .on_conflict_do_nothing(
+        index_elements=[CouponRedemption.user_id, CouponRedemption.coupon_code],
+    )
+    .returning(CouponRedemption.id)
+)
+
+# Only a valid index can be an ON CONFLICT target; a failed concurrent
+# build leaves an invalid one behind
+REDEMPTION_INDEX_READY = text(
+    "SELECT EXISTS (SELECT 1 FROM pg_index"
+    " WHERE indexrelid = to_regclass('ix_coupon_redemption_user_code')"
+    " AND indisvalid)"
+)
+
+# Check-then-insert fallback for databases without the index
+REDEMPTION_EXISTS = select(
+    select(CouponRedemption.id)
+    .where(
+        CouponRedemption.user_id == bindparam("user_id"),
+        CouponRedemption.coupon_code == bindparam("code"),
+    )
+    .exists()
+)
+INSERT_REDEMPTION = insert(CouponRedemption).values(
+    user_id=bindparam("user_id"),
+    coupon_code=bindparam("code"),
+)
+
+# Set once the index is seen, so migrated databases skip the check
+_redemption_index_ready = False
+
+# Claims a use only while the coupon is still valid, so concurrent
+# redemptions cannot overshoot max_uses. An UPDATE can't bind a parameter
+# named after one of its table's columns, hence coupon_code.
+CLAIM_COUPON_USE = (
+    update(Coupon)
+    .where(Coupon.code == bindparam("coupon_code"), Coupon.valid_filter())
+    .values(current_uses=Coupon.current_uses + 1)
+    .returning(Coupon.current_uses)
+    .execution_options(synchronize_session=False)
+)
+
 
 class SubscriptionResponse(BaseModel):
     """Response model for subscription info."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     plan: str
     status: str
     is_active: bool
@@ -57,6 +119,8 @@ class RedeemCouponRequest(BaseModel):
 class RedeemCouponResponse(BaseModel):
     """Response model for coupon redemption."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     success: bool
     message: str
     plan: Optional[str] = None
@@ -75,6 +139,8 @@ class CheckoutSessionRequest(BaseModel):
 class CheckoutSessionResponse(BaseModel):
     """Response model for checkout session."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     checkout_url: str
 
 
@@ -87,13 +153,76 @@ class PortalSessionRequest(BaseModel):
 class PortalSessionResponse(BaseModel):
     """Response model for portal session."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     portal_url: str
 
 
-@router.get("/subscription", response_model=SubscriptionResponse)
+async def _record_redemption(db: AsyncSession, user_id: str, code: str) -> bool:
+    """
+    Record that a user redeemed a coupon.
+    
+    Uses the atomic ON CONFLICT insert once the unique index exists, and
+    a check-then-insert before that.
+    
+    Args:
+        db: Database session.
+        user_id: Redeeming user's ID.
+        code: Normalized coupon code.
+        
+    Returns:
+        True if recorded, False if the user already redeemed the coupon.
+    """
+    global _redemption_index_ready
+    params = {"user_id": user_id, "code": code}
+    
+    if not _redemption_index_ready:
+        _redemption_index_ready = bool(await db.scalar(REDEMPTION_INDEX_READY))
+    if _redemption_index_ready:
+        result = await db.execute(RECORD_REDEMPTION, params)
+        return result.scalar_one_or_none() is not None
+    
+    if await db.scalar(REDEMPTION_EXISTS, params):
+        return False
+    await db.execute(INSERT_REDEMPTION, params)
+    return True
+
+
+async def _get_or_create_subscription(db: AsyncSession, user: User) -> Subscription:
+    """
+    Return the user's subscription, creating a default one if missing.
+    
+    Uses a single upsert on the unique user_id so concurrent requests
+    converge on the same row instead of racing a SELECT then INSERT.
+    
+    Args:
+        db: Database session.
+        user: User loaded with their subscription.
+        
+    Returns:
+        The user's Subscription, attached to the session.
+    """
+    if user.subscription is not None:
+        return user.subscription
+    
+    # The no-op update makes RETURNING yield the row when it already exists
+    stmt = pg_insert(Subscription).values(user_id=user.id)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Subscription.user_id],
+        set_={"user_id": stmt.excluded.user_id},
+    ).returning(Subscription)
+    result = await db.scalars(stmt, execution_options={"populate_existing": True})
+    return result.one()
+
+
+@router.get(
+    "/subscription",
+    response_model=None,
+    responses={200: {"model": SubscriptionResponse}},
+)
 async def get_user_subscription(
     subscription: Subscription = Depends(get_subscription),
-) -> Dict[str, Any]:
+) -> SubscriptionResponse:
     """
     Get the current user's subscription status.
     
@@ -102,23 +231,28 @@ async def get_user_subscription(
     Returns:
         SubscriptionResponse with current plan and status.
     """
-    return {
-        "plan": subscription.plan,
-        "status": subscription.status,
-        "is_active": subscription.is_active,
-        "has_premium_access": subscription.has_premium_access,
-        "trial_ends_at": subscription.trial_ends_at,
-        "current_period_end": subscription.current_period_end,
-        "stripe_customer_id": subscription.stripe_customer_id,
-    }
-
-
-@router.post("/redeem-coupon", response_model=RedeemCouponResponse)
+    # Values come straight from the ORM, so skip validation
+    return SubscriptionResponse.model_construct(
+        plan=subscription.plan,
+        status=subscription.status,
+        is_active=subscription.is_active,
+        has_premium_access=subscription.has_premium_access,
+        trial_ends_at=subscription.trial_ends_at,
+        current_period_end=subscription.current_period_end,
+        stripe_customer_id=subscription.stripe_customer_id,
+    )
+
+
+@router.post(
+    "/redeem-coupon",
+    response_model=None,
+    responses={200: {"model": RedeemCouponResponse}},
+)
 async def redeem_coupon(
     request: RedeemCouponRequest,
     user: User = Depends(get_current_user_with_db),
     db: AsyncSession = Depends(get_db),
-) -> Dict[str, Any]:
+) -> RedeemCouponResponse:
     """
     Validate and apply a coupon code.
     
@@ -139,9 +273,7 @@ async def redeem_coupon(
     code = request.code.strip().upper()
     
     # Find the coupon
-    result = await db.execute(
-        select(Coupon).where(Coupon.code == code)
-    )
+    result = await db.execute(COUPON_BY_CODE, {"code": code})
     coupon = result.scalar_one_or_none()
     
     if not coupon:
@@ -169,30 +301,23 @@ async def redeem_coupon(
             detail="This coupon has reached its maximum uses",
         )
     
-    # Check if user already redeemed this coupon
-    result = await db.execute(
-        select(CouponRedemption).where(
-            CouponRedemption.user_id == user.id,
-            CouponRedemption.coupon_code == code,
-        )
-    )
-    existing_redemption = result.scalar_one_or_none()
-    
-    if existing_redemption:
+    # Record the redemption
+    if not await _record_redemption(db, user.id, code):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="You have already redeemed this coupon",
         )
     
-    # Get or create subscription
-    result = await db.execute(
-        select(Subscription).where(Subscription.user_id == user.id)
-    )
-    subscription = result.scalar_one_or_none()
+    # Claim a use atomically (the redemption above rolls back with the
+    # request if this fails)
+    result = await db.execute(CLAIM_COUPON_USE, {"coupon_code": code})
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This coupon has reached its maximum uses",
+        )
     
-    if not subscription:
-        subscription = Subscription(user_id=user.id)
-        db.add(subscription)
+    subscription = await _get_or_create_subscription(db, user)
     
     # Apply coupon
     trial_ends_at = datetime.now(timezone.utc) + timedelta(days=coupon.trial_days)
@@ -200,37 +325,32 @@ async def redeem_coupon(
     subscription.status = "trialing"
     subscription.trial_ends_at = trial_ends_at
     
-    # Record redemption
-    redemption = CouponRedemption(
-        user_id=user.id,
-        coupon_code=code,
-    )
-    db.add(redemption)
-    
-    # Increment coupon uses
-    coupon.current_uses += 1
-    
     await db.commit()
     
-    return {
-        "success": True,
-        "message": f"Coupon applied! You now have {coupon.trial_days} days of {coupon.plan.title()} access.",
-        "plan": coupon.plan,
-        "trial_ends_at": trial_ends_at,
-    }
+    return RedeemCouponResponse.model_construct(
+        success=True,
+        message=f"Coupon applied! You now have {coupon.trial_days} days of {coupon.plan.title()} access.",
+        plan=coupon.plan,
+        trial_ends_at=trial_ends_at,
+    )
 
 
-@router.post("/create-checkout-session", response_model=CheckoutSessionResponse)
+@router.post(
+    "/create-checkout-session",
+    response_model=None,
+    responses={200: {"model": CheckoutSessionResponse}},
+)
 async def create_checkout_session(
     request: CheckoutSessionRequest,
     user: User = Depends(get_current_user_with_db),
     db: AsyncSession = Depends(get_db),
-) -> Dict[str, str]:
+) -> CheckoutSessionResponse:
     """
     Create a Stripe checkout session for subscription purchase.
     
-    Creates or retrieves the Stripe customer for the user,
-    then creates a checkout session for the selected plan.
+    Creates a checkout session for the selected plan, reusing the
+    user's Stripe customer if they have one. First-time buyers get a
+    customer created by Stripe during checkout.
     
     Requires authentication.
     
@@ -269,46 +389,36 @@ async def create_checkout_session(
 
     logger.info(f"Creating checkout for plan={request.plan}, mode={mode}, trial_days={trial_days}")
 
-    # Get or create subscription record
-    result = await db.execute(
-        select(Subscription).where(Subscription.user_id == user.id)
-    )
-    subscription = result.scalar_one_or_none()
-
-    if not subscription:
-        subscription = Subscription(user_id=user.id)
-        db.add(subscription)
-        await db.flush()
+    subscription = await _get_or_create_subscription(db, user)
 
-    # Get or create Stripe customer
-    if not subscription.stripe_customer_id:
-        customer_id = await stripe_service.create_customer(
-            email=user.email,
-            user_id=str(user.id),
-        )
-        subscription.stripe_customer_id = customer_id
-        await db.commit()
-    else:
-        customer_id = subscription.stripe_customer_id
-
-    # Create checkout session
+    # Create checkout session. New customers are created by Stripe when the
+    # checkout completes; the webhook links them back via client_reference_id.
     checkout_url = await stripe_service.create_checkout_session(
-        customer_id=customer_id,
+        customer_id=subscription.stripe_customer_id,
         price_id=price_id,
         success_url=request.success_url,
         cancel_url=request.cancel_url,
         mode=mode,
         trial_days=trial_days,
+        customer_email=user.email,
+        client_reference_id=str(user.id),
     )
 
-    return {"checkout_url": checkout_url}
+    # Persist the subscription upsert so the webhook can find the row
+    await db.commit()
+
+    return CheckoutSessionResponse.model_construct(checkout_url=checkout_url)
 
 
-@router.post("/create-portal-session", response_model=PortalSessionResponse)
+@router.post(
+    "/create-portal-session",
+    response_model=None,
+    responses={200: {"model": PortalSessionResponse}},
+)
 async def create_portal_session(
     request: PortalSessionRequest,
     subscription: Subscription = Depends(get_subscription),
-) -> Dict[str, str]:
+) -> PortalSessionResponse:
     """
     Create a Stripe customer portal session.
     
@@ -337,4 +447,4 @@ async def create_portal_session(
         return_url=request.return_url,
     )
     
-    return {"portal_url": portal_url}
+    return PortalSessionResponse.model_construct(portal_url=portal_url)
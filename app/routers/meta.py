@@ -1,18 +1,23 @@
 """Model metadata endpoint."""
 
-from typing import Any, Dict, List
+from typing import List
 
-from fastapi import APIRouter
-from pydantic import BaseModel
+from fastapi import APIRouter, Response
+from pydantic import BaseModel, ConfigDict
 
 from app.services.prediction_service import prediction_service
 
 router = APIRouter(tags=["Meta"])
 
+# Model metadata only changes once per model run
+META_CACHE_CONTROL = "public, max-age=300"
+
 
 class MetaResponse(BaseModel):
     """Response model for /meta endpoint."""
     
+    model_config = ConfigDict(defer_build=True)
+    
     model_version: str
     last_run: str
     odds_updated: str
@@ -22,8 +27,12 @@ class MetaResponse(BaseModel):
     api_version: str = "1.0.0"
 
 
-@router.get("/meta", response_model=MetaResponse)
-async def get_model_meta() -> Dict[str, Any]:
+@router.get(
+    "/meta",
+    response_model=None,
+    responses={200: {"model": MetaResponse}},
+)
+async def get_model_meta(response: Response) -> MetaResponse:
     """
     Get model metadata.
     
@@ -35,4 +44,6 @@ async def get_model_meta() -> Dict[str, Any]:
     Returns:
         MetaResponse with model information.
     """
-    return await prediction_service.get_meta()
+    response.headers["Cache-Control"] = META_CACHE_CONTROL
+    # get_meta already fills every field, so skip validation
+    return MetaResponse.model_construct(**await prediction_service.get_meta())
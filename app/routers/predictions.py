@@ -1,8 +1,18 @@
 """Prediction endpoints."""
 
-from typing import Any, Dict, Optional
+from typing import Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Response,
+    status,
+)
+from fastapi.responses import ORJSONResponse
 
 from app.dependencies import get_current_user, get_current_user_with_db
 from app.models.user import User
@@ -10,11 +20,29 @@ from app.services.prediction_service import prediction_service
 
 router = APIRouter(prefix="/predictions", tags=["Predictions"])
 
+# Per-user responses (tiered, audited), so only the browser may reuse them
+PREDICTIONS_CACHE_HEADERS = {"Cache-Control": "private, max-age=60"}
 
-@router.get("/latest")
+# Upper bound on games per batch request (a full NBA slate is 15)
+MAX_BATCH_GAME_IDS = 30
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header (weak comparison) against our ETag."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+@router.get("/latest", response_model=None)
 async def get_latest_predictions(
+    background_tasks: BackgroundTasks,
+    if_none_match: Optional[str] = Header(None),
     user_info: Dict[str, str] = Depends(get_current_user),
-) -> Dict[str, Any]:
+) -> Response:
     """
     Get the latest predictions for today and tomorrow.
     
@@ -26,34 +54,110 @@ async def get_latest_predictions(
     
     Requires authentication.
     
+    Sends an ETag; a request whose If-None-Match matches the current
+    predictions gets an empty 304 instead of the payload.
+    
+    Args:
+        if_none_match: If-None-Match header from a previous response's ETag.
+    
     Returns:
-        BackendPredictionResponse structure.
+        BackendPredictionResponse structure, or 304 Not Modified.
         
     Raises:
         HTTPException(503): If predictions are unavailable.
     """
-    # Log access for auditing
-    prediction_service.log_prediction_access(
+    # Log access for auditing once the response has been sent
+    background_tasks.add_task(
+        prediction_service.log_prediction_access,
         user_id=user_info["sub"],
         endpoint="latest",
     )
     
-    predictions = await prediction_service.get_latest_predictions()
+    # Pre-serialized by the service, so no per-request JSON encoding
+    encoded = await prediction_service.get_latest_predictions_bytes()
     
-    if not predictions:
+    if not encoded:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Predictions are currently unavailable",
         )
     
-    return predictions
+    body, etag = encoded
+    headers = {**PREDICTIONS_CACHE_HEADERS, "ETag": etag}
+    
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+# Declared before /games/{game_id} so "batch" isn't taken as a game ID
+@router.get("/games/batch", response_model=None)
+async def get_game_details_batch(
+    background_tasks: BackgroundTasks,
+    ids: str = Query(..., description="Comma-separated game identifiers"),
+    user: User = Depends(get_current_user_with_db),
+) -> ORJSONResponse:
+    """
+    Get detailed predictions for several games in one request.
+    
+    Intended for screens that list a whole slate of games. Each game is
+    filtered by plan exactly as in /games/{game_id}.
+    
+    Requires authentication.
+    
+    Args:
+        ids: Comma-separated game identifiers
+             (e.g., "PHI@MEM_2025-12-30,BOS@NYK_2025-12-30").
+        
+    Returns:
+        Dict with "games" (game_id -> detail) and "not_found" (game_ids
+        with no detail file).
+        
+    Raises:
+        HTTPException(400): If no IDs or too many IDs are given.
+    """
+    game_ids = [game_id for game_id in (part.strip() for part in ids.split(",")) if game_id]
+    
+    if not game_ids or len(game_ids) > MAX_BATCH_GAME_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Provide between 1 and {MAX_BATCH_GAME_IDS} game IDs",
+        )
+    
+    # Log access for auditing once the response has been sent
+    background_tasks.add_task(
+        prediction_service.log_prediction_access,
+        user_id=str(user.id),
+        game_id=",".join(game_ids),
+        endpoint="game_detail_batch",
+    )
+    
+    has_premium = user.subscription is not None and user.subscription.has_premium_access
+    details = await prediction_service.get_game_details_bulk(
+        game_ids,
+        tier="premium" if has_premium else "free",
+    )
+    
+    return ORJSONResponse(
+        {
+            "games": {game_id: detail for game_id, detail in details.items() if detail},
+            "not_found": [game_id for game_id, detail in details.items() if not detail],
+        },
+        headers=PREDICTIONS_CACHE_HEADERS,
+    )
 
 
-@router.get("/games/{game_id}")
+@router.get("/games/{game_id}", response_model=None)
 async def get_game_detail(
     game_id: str,
+    background_tasks: BackgroundTasks,
     user: User = Depends(get_current_user_with_db),
-) -> Dict[str, Any]:
+) -> ORJSONResponse:
     """
     Get detailed predictions for a specific game.
     
@@ -77,14 +181,20 @@ async def get_game_detail(
         HTTPException(404): If game not found.
         HTTPException(403): If user lacks required plan for detailed data.
     """
-    # Log access for auditing
-    prediction_service.log_prediction_access(
+    # Log access for auditing once the response has been sent
+    background_tasks.add_task(
+        prediction_service.log_prediction_access,
         user_id=str(user.id),
         game_id=game_id,
         endpoint="game_detail",
     )
     
-    game_detail = await prediction_service.get_game_detail(game_id)
+    # Premium users get everything; free users get basic predictions only
+    has_premium = user.subscription is not None and user.subscription.has_premium_access
+    game_detail = await prediction_service.get_game_detail(
+        game_id,
+        tier="premium" if has_premium else "free",
+    )
     
     if not game_detail:
         raise HTTPException(
@@ -92,31 +202,4 @@ async def get_game_detail(
             detail=f"Game not found: {game_id}",
         )
     
-    # Filter data based on subscription plan
-    # Premium users get everything; free users get basic predictions only
-    if not user.subscription or not user.subscription.has_premium_access:
-        game_detail = _filter_for_free_tier(game_detail)
-    
-    return game_detail
-
-
-def _filter_for_free_tier(data: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Filter game detail data for free tier users.
-    
-    Free tier gets basic predictions only — no player impact,
-    no scenario analysis, no prediction history.
-    """
-    return {
-        "prediction_id": data.get("prediction_id"),
-        "game_id": data.get("game_id"),
-        "prediction_timestamp": data.get("prediction_timestamp"),
-        "teams": data.get("teams"),
-        "predictions": {
-            "final_spread": data.get("predictions", {}).get("final_spread"),
-            "final_total": data.get("predictions", {}).get("final_total"),
-            "final_home_win_prob": data.get("predictions", {}).get("final_home_win_prob"),
-            "confidence": data.get("predictions", {}).get("confidence"),
-        },
-        "context": data.get("context"),
-    }
+    return ORJSONResponse(game_detail, headers=PREDICTIONS_CACHE_HEADERS)
@@ -1,24 +1,55 @@
 """Webhook endpoints for external service integrations."""
 
+import asyncio
 import logging
 from typing import Any, Dict
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Request, status
 
-from app.db.database import get_db
+from app.db.database import async_session_maker
+from app.services.redis_client import redis_set
 from app.services.stripe_service import stripe_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
 
+# How long delivered Stripe event IDs are remembered for deduplication
+STRIPE_EVENT_DEDUP_TTL = 86400
+
+
+async def _process_stripe_event(event: Dict[str, Any]) -> None:
+    """
+    Apply a verified Stripe event to the database.
+    
+    Runs as a background task after the webhook has been acknowledged, so it
+    opens its own session (the request-scoped one is already closed).
+    
+    Args:
+        event: Verified Stripe event.
+    """
+    event_type = event["type"]
+    
+    try:
+        async with async_session_maker() as db:
+            if event_type == "checkout.session.completed":
+                await stripe_service.handle_checkout_completed(event, db)
+            elif event_type == "customer.subscription.updated":
+                await stripe_service.handle_subscription_updated(event, db)
+            elif event_type == "customer.subscription.deleted":
+                await stripe_service.handle_subscription_deleted(event, db)
+            else:
+                logger.debug("Unhandled webhook event type: %s", event_type)
+    except Exception:
+        # Stripe has already received its 200; log for investigation
+        logger.exception("Error processing webhook %s (%s)", event_type, event.get("id"))
+
 
 @router.post("/stripe")
 async def handle_stripe_webhook(
     request: Request,
+    background_tasks: BackgroundTasks,
     stripe_signature: str = Header(..., alias="Stripe-Signature"),
-    db: AsyncSession = Depends(get_db),
 ) -> Dict[str, str]:
     """
     Handle Stripe webhook events.
@@ -29,9 +60,14 @@ async def handle_stripe_webhook(
     - customer.subscription.deleted: Cancellations
     
     No authentication required (uses Stripe signature verification).
+    Events are processed in a background task after the 200 is sent, so
+    handler latency never counts against Stripe's delivery timeout.
+    Redelivered events are acknowledged without reprocessing when Redis
+    is configured.
     
     Args:
         request: Raw HTTP request for payload access.
+        background_tasks: Queue for post-response event processing.
         stripe_signature: Stripe-Signature header for verification.
         
     Returns:
@@ -43,35 +79,30 @@ async def handle_stripe_webhook(
     # Get raw payload
     payload = await request.body()
     
-    # Verify signature and construct event
+    # Verify signature and construct event off the event loop (HMAC plus a
+    # full JSON parse of the payload)
     try:
-        event = stripe_service.verify_webhook_signature(
-            payload=payload,
-            signature=stripe_signature,
+        event = await asyncio.to_thread(
+            stripe_service.verify_webhook_signature,
+            payload,
+            stripe_signature,
         )
     except ValueError as e:
-        logger.warning(f"Invalid webhook signature: {e}")
+        logger.warning("Invalid webhook signature: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid webhook signature",
         )
     
-    event_type = event["type"]
-    logger.info(f"Received Stripe webhook: {event_type}")
+    # First delivery wins; None means Redis is unavailable, so process anyway
+    first_delivery = await redis_set(
+        f"stripe:evt:{event['id']}", b"1", STRIPE_EVENT_DEDUP_TTL, nx=True
+    )
+    if first_delivery is False:
+        logger.info("Skipping duplicate Stripe webhook: %s", event["id"])
+        return {"received": "duplicate"}
     
-    # Handle events
-    try:
-        if event_type == "checkout.session.completed":
-            await stripe_service.handle_checkout_completed(event, db)
-        elif event_type == "customer.subscription.updated":
-            await stripe_service.handle_subscription_updated(event, db)
-        elif event_type == "customer.subscription.deleted":
-            await stripe_service.handle_subscription_deleted(event, db)
-        else:
-            logger.debug(f"Unhandled webhook event type: {event_type}")
-    except Exception as e:
-        logger.error(f"Error processing webhook {event_type}: {e}")
-        # Don't raise - return 200 to prevent Stripe retries
-        # Log the error for investigation
+    logger.info("Received Stripe webhook: %s", event["type"])
+    background_tasks.add_task(_process_stripe_event, event)
     
     return {"received": "true"}
@@ -5,19 +5,40 @@ Fetches JWKS from Cognito and validates JWT tokens.
 Uses caching for JWKS to avoid repeated network calls.
 """
 
+import asyncio
+import hashlib
+import json
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 import httpx
-from cachetools import TTLCache
-from jose import JWTError, jwt
-from jose.exceptions import ExpiredSignatureError
+import jwt
+from cachetools import TLRUCache, TTLCache
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPublicKey
+from jwt.algorithms import RSAAlgorithm
 
 from app.config import get_settings
+from app.services.redis_client import redis_get, redis_set
 
 logger = logging.getLogger(__name__)
 
+JWKS_TTL_SECONDS = 3600
+JWKS_REDIS_KEY = "cognito:jwks"
+# A token with an unknown kid forces a JWKS refetch (Cognito rotated its
+# keys), but at most once per this many seconds per worker
+JWKS_REFETCH_COOLDOWN = 60
+
+# Validated claims are remembered until the token's own exp, capped at ~75%
+# of Cognito's 1h token lifetime
+TOKEN_CACHE_MAX_TTL = 3300
+
+
+def _claims_ttu(_key: bytes, value: Tuple[float, Dict[str, Any]], now: float) -> float:
+    exp, _ = value
+    return min(exp, now + TOKEN_CACHE_MAX_TTL)
+
 
 class CognitoService:
     """
@@ -31,22 +52,70 @@ class CognitoService:
 
     def __init__(self):
         self.settings = get_settings()
-        # Cache JWKS for 1 hour
-        self._jwks_cache: TTLCache = TTLCache(maxsize=1, ttl=3600)
+        # Read on every validation; plain attributes skip the settings lookup
+        self._issuer = self.settings.cognito_issuer
+        self._client_id = self.settings.cognito_client_id
+        self._jwks_url = self.settings.cognito_jwks_url
+        # Cache JWKS for 1 hour (L1; Redis is the shared L2 when configured)
+        self._jwks_cache: TTLCache = TTLCache(maxsize=1, ttl=JWKS_TTL_SECONDS)
+        # Single-flight guard so a cold cache triggers one JWKS fetch, not N
+        self._jwks_lock = asyncio.Lock()
+        # time.monotonic() of the last JWKS fetch from Cognito itself
+        self._jwks_fetched_at = 0.0
+        # Validated claims keyed by token digest; never holds failures
+        self._token_cache: TLRUCache = TLRUCache(
+            maxsize=10_000, ttu=_claims_ttu, timer=time.time
+        )
         self._http_client: Optional[httpx.AsyncClient] = None
 
     async def _get_http_client(self) -> httpx.AsyncClient:
-        """Get or create HTTP client."""
+        """Get or create the long-lived HTTP/2 client."""
         if self._http_client is None or self._http_client.is_closed:
-            self._http_client = httpx.AsyncClient(timeout=10.0)
+            self._http_client = httpx.AsyncClient(
+                timeout=10.0,
+                http2=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=20,
+                    max_connections=100,
+                    keepalive_expiry=60,
+                ),
+            )
         return self._http_client
 
-    async def _fetch_jwks(self) -> Dict[str, Any]:
+    async def start(self) -> None:
+        """
+        Open the HTTP client and warm the JWKS cache at startup.
+        
+        A failed prefetch is only logged; the first request retries it.
+        """
+        await self._get_http_client()
+        try:
+            await self._fetch_jwks()
+        except Exception:
+            logger.warning("Could not prefetch Cognito JWKS at startup", exc_info=True)
+
+    @staticmethod
+    def _build_key_map(jwks: Dict[str, Any]) -> Dict[str, RSAPublicKey]:
+        """Parse each JWK into a ready-to-verify public key, keyed by kid."""
+        return {
+            key["kid"]: RSAAlgorithm.from_jwk(key)
+            for key in jwks.get("keys", [])
+            if key.get("kid")
+        }
+
+    async def _fetch_jwks(self, force: bool = False) -> Dict[str, RSAPublicKey]:
         """
         Fetch JWKS from Cognito.
         
+        Keys are parsed once per fetch, so token validation never re-parses
+        a JWK.
+        
+        Args:
+            force: Skip the local and Redis caches and go to Cognito, unless
+                that already happened within JWKS_REFETCH_COOLDOWN.
+        
         Returns:
-            Dict containing the JWKS keys.
+            Dict mapping each key's kid to its prepared public key.
             
         Raises:
             RuntimeError: If JWKS cannot be fetched.
@@ -54,34 +123,56 @@ class CognitoService:
         cache_key = "jwks"
         
         # Check cache first
-        if cache_key in self._jwks_cache:
+        if not force and cache_key in self._jwks_cache:
             return self._jwks_cache[cache_key]
         
-        try:
-            client = await self._get_http_client()
-            response = await client.get(self.settings.cognito_jwks_url)
-            response.raise_for_status()
-            jwks = response.json()
-            
-            # Cache the JWKS
-            self._jwks_cache[cache_key] = jwks
-            logger.info("Fetched and cached Cognito JWKS")
+        async with self._jwks_lock:
+            if force:
+                # Requests carrying the same new kid all land here; only the
+                # first one goes to Cognito
+                recent = time.monotonic() - self._jwks_fetched_at < JWKS_REFETCH_COOLDOWN
+                if recent and cache_key in self._jwks_cache:
+                    return self._jwks_cache[cache_key]
+            else:
+                # Double-check cache after acquiring lock
+                if cache_key in self._jwks_cache:
+                    return self._jwks_cache[cache_key]
+                
+                # Then the cache shared by all workers
+                cached = await redis_get(JWKS_REDIS_KEY)
+                if cached:
+                    keys = self._build_key_map(json.loads(cached))
+                    self._jwks_cache[cache_key] = keys
+                    return keys
             
-            return jwks
-        except httpx.HTTPError as e:
-            logger.error(f"Failed to fetch JWKS: {e}")
-            raise RuntimeError(f"Failed to fetch JWKS from Cognito: {e}")
+            try:
+                client = await self._get_http_client()
+                response = await client.get(self._jwks_url)
+                response.raise_for_status()
+                jwks = response.json()
+                
+                # Cache the parsed keys locally and the raw JWKS for other workers
+                keys = self._build_key_map(jwks)
+                self._jwks_cache[cache_key] = keys
+                self._jwks_fetched_at = time.monotonic()
+                await redis_set(JWKS_REDIS_KEY, response.content, JWKS_TTL_SECONDS)
+                logger.info("Fetched and cached Cognito JWKS")
+                
+                return keys
+            except httpx.HTTPError as e:
+                logger.error("Failed to fetch JWKS: %s", e)
+                raise RuntimeError(f"Failed to fetch JWKS from Cognito: {e}")
 
-    def _get_signing_key(self, jwks: Dict[str, Any], token: str) -> Optional[Dict[str, Any]]:
+    def _get_signing_key(self, keys: Dict[str, RSAPublicKey], token: str) -> Optional[RSAPublicKey]:
         """
-        Get the signing key from JWKS that matches the token's kid.
+        Get the signing key that matches the token's kid.
         
         Args:
-            jwks: The JWKS containing all keys.
+            keys: Prepared public keys keyed by kid.
             token: The JWT token to find the key for.
             
         Returns:
-            The matching key dict or None if not found.
+            The matching key or None if not found.
         """
         try:
             # Get the key ID from the token header
@@ -93,14 +184,14 @@ class CognitoService:
                 return None
             
             # Find the matching key
-            for key in jwks.get("keys", []):
-                if key.get("kid") == kid:
-                    return key
+            key = keys.get(kid)
+            if key is not None:
+                return key
             
-            logger.warning(f"No matching key found for kid: {kid}")
+            logger.warning("No matching key found for kid: %s", kid)
             return None
-        except JWTError as e:
-            logger.error(f"Error parsing token header: {e}")
+        except jwt.PyJWTError as e:
+            logger.error("Error parsing token header: %s", e)
             return None
 
     async def validate_token(self, token: str) -> Dict[str, Any]:
@@ -119,11 +210,22 @@ class CognitoService:
         Raises:
             ValueError: If the token is invalid, expired, or verification fails.
         """
+        # Repeat requests with the same bearer token skip RS256 verification
+        cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cached = self._token_cache.get(cache_key)
+        if cached is not None:
+            return cached[1]
+        
         # Fetch JWKS
-        jwks = await self._fetch_jwks()
+        keys = await self._fetch_jwks()
         
         # Get the signing key
-        signing_key = self._get_signing_key(jwks, token)
+        signing_key = self._get_signing_key(keys, token)
+        if not signing_key:
+            # The cached set (possibly from Redis, so older than our L1 TTL)
+            # may predate a key rotation
+            keys = await self._fetch_jwks(force=True)
+            signing_key = self._get_signing_key(keys, token)
         if not signing_key:
             raise ValueError("Unable to find appropriate signing key")
         
@@ -133,31 +235,39 @@ class CognitoService:
                 token,
                 signing_key,
                 algorithms=["RS256"],
-                audience=self.settings.cognito_client_id,
-                issuer=self.settings.cognito_issuer,
+                issuer=self._issuer,
                 options={
                     "verify_signature": True,
-                    "verify_aud": True,
+                    "verify_aud": False,
                     "verify_iss": True,
                     "verify_exp": True,
-                    "require_exp": True,
-                    "require_sub": True,
+                    "require": ["exp", "sub"],
                 },
             )
             
+            # Cognito access tokens carry client_id instead of aud, so only
+            # check the audience when the token has one
+            audience = claims.get("aud")
+            if audience is not None:
+                if isinstance(audience, str):
+                    audience = [audience]
+                if self._client_id not in audience:
+                    raise ValueError("Token validation failed: Invalid audience")
+            
             # Validate token_use claim (should be "id" for ID tokens)
             token_use = claims.get("token_use")
             if token_use not in ("id", "access"):
                 raise ValueError(f"Invalid token_use: {token_use}")
             
-            logger.debug(f"Successfully validated token for user: {claims.get('sub')}")
+            logger.debug("Successfully validated token for user: %s", claims.get("sub"))
+            self._token_cache[cache_key] = (float(claims["exp"]), claims)
             return claims
             
-        except ExpiredSignatureError:
+        except jwt.ExpiredSignatureError:
             logger.warning("Token has expired")
             raise ValueError("Token has expired")
-        except JWTError as e:
-            logger.warning(f"JWT validation failed: {e}")
+        except jwt.InvalidTokenError as e:
+            logger.warning("JWT validation failed: %s", e)
             raise ValueError(f"Token validation failed: {e}")
 
     async def get_user_info(self, token: str) -> Dict[str, str]:
@@ -5,20 +5,52 @@ Caches predictions in memory with automatic refresh.
 """
 
 import asyncio
+import hashlib
 import json
 import logging
+import re
+from contextlib import AsyncExitStack
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Optional, Tuple
 from urllib.parse import unquote
 
-import boto3
+import aioboto3
+import msgpack
+import orjson
+from aiobotocore.config import AioConfig
 from botocore.exceptions import ClientError
 from cachetools import TTLCache
 
 from app.config import get_settings
+from app.services.redis_client import redis_get, redis_set
 
 logger = logging.getLogger(__name__)
 
+# Matches the in-process cache TTL; predictions only change once per model run
+LATEST_CACHE_TTL = 60
+LATEST_REDIS_KEY = "predictions:latest"
+# Refresh a little before the cached copy expires so readers never miss
+LATEST_REFRESH_INTERVAL = LATEST_CACHE_TTL - 5
+
+S3_READ_CHUNK_SIZE = 64 * 1024
+
+# Path traversal characters in game IDs, rewritten to "_" before building
+# an S3 key; most IDs contain none and skip the rewrite
+_UNSAFE_GAME_ID = re.compile(r"[/\\]|\.\.")
+_GAME_ID_SANITIZE = str.maketrans({"/": "_", "\\": "_"})
+
+# Returned by get_meta while no predictions are available
+DEFAULT_META: Mapping[str, Any] = MappingProxyType({
+    "model_version": "unknown",
+    "last_run": "",
+    "odds_updated": "",
+    "feature_count": 0,
+    "training_games": 0,
+    "training_seasons": [],
+    "api_version": "1.0.0",
+})
+
 
 class PredictionService:
     """
@@ -32,156 +64,428 @@ class PredictionService:
 
     def __init__(self):
         self.settings = get_settings()
-        # Cache predictions for 60 seconds
-        self._cache: TTLCache = TTLCache(maxsize=100, ttl=60)
+        # Cache predictions for 60 seconds. Latest/meta entries live apart
+        # from per-game entries so a burst of game lookups can't evict them.
+        self._latest_cache: TTLCache = TTLCache(maxsize=4, ttl=60)
+        self._game_cache: TTLCache = TTLCache(maxsize=1024, ttl=60)
+        # S3 keys that returned NoSuchKey, so repeated misses skip S3
+        self._neg_cache: TTLCache = TTLCache(maxsize=1024, ttl=10)
+        self._session = aioboto3.Session()
         self._s3_client = None
-        self._lock = asyncio.Lock()
+        self._s3_exit_stack: Optional[AsyncExitStack] = None
+        self._client_lock = asyncio.Lock()
+        # In-flight fetches by cache key, so concurrent misses share one read
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Object format published by the prediction pipeline
+        self._ext = "msgpack" if self.settings.predictions_format == "msgpack" else "json"
+        self._latest_key = f"latest.{self._ext}"
+        self._latest_redis_key = f"{LATEST_REDIS_KEY}:{self._ext}"
+        # ETag of the cached latest object, for conditional refreshes
+        self._latest_etag: Optional[str] = None
 
-    def _get_s3_client(self):
-        """Get or create S3 client."""
+    async def _get_s3_client(self):
+        """Get or create the long-lived async S3 client."""
         if self._s3_client is None:
-            self._s3_client = boto3.client(
-                "s3",
-                region_name=self.settings.aws_region,
-                aws_access_key_id=self.settings.aws_access_key_id or None,
-                aws_secret_access_key=self.settings.aws_secret_access_key or None,
-            )
+            async with self._client_lock:
+                if self._s3_client is None:
+                    stack = AsyncExitStack()
+                    self._s3_client = await stack.enter_async_context(
+                        self._session.client(
+                            "s3",
+                            region_name=self.settings.aws_region,
+                            aws_access_key_id=self.settings.aws_access_key_id or None,
+                            aws_secret_access_key=self.settings.aws_secret_access_key or None,
+                            # A pool as large as our fan-out keeps warm TLS
+                            # connections instead of handshaking on contention
+                            config=AioConfig(
+                                max_pool_connections=self.settings.s3_max_pool_connections,
+                                retries={"max_attempts": 3, "mode": "standard"},
+                                tcp_keepalive=True,
+                            ),
+                        )
+                    )
+                    self._s3_exit_stack = stack
         return self._s3_client
 
-    async def _read_s3_object(self, key: str) -> Optional[Dict[str, Any]]:
+    async def start(self) -> None:
+        """Open the S3 client at startup so the first request doesn't pay for it."""
+        await self._get_s3_client()
+
+    async def close(self) -> None:
+        """Close the S3 client."""
+        if self._s3_exit_stack is not None:
+            await self._s3_exit_stack.aclose()
+            self._s3_exit_stack = None
+            self._s3_client = None
+
+    @staticmethod
+    async def _read_body(response: Dict[str, Any]) -> bytearray:
         """
-        Read and parse JSON object from S3.
+        Read a streaming S3 body into one buffer presized from ContentLength.
+        
+        Chunks are copied into place as they arrive, so the body is never
+        re-concatenated; the parsers all accept the bytearray directly.
+        """
+        buffer = bytearray(response.get("ContentLength") or 0)
+        offset = 0
+        body = response["Body"]
+        # Entering the StreamingBody yields the raw aiohttp response, which
+        # has no iter_chunks; it only guarantees the connection is released
+        async with body:
+            async for chunk in body.iter_chunks(S3_READ_CHUNK_SIZE):
+                end = offset + len(chunk)
+                # Grows the buffer if the object is longer than advertised
+                buffer[offset:end] = chunk
+                offset = end
+        del buffer[offset:]
+        return buffer
+
+    async def _read_s3_bytes(self, key: str) -> Optional[bytearray]:
+        """
+        Read a raw object body from S3.
         
         Args:
             key: S3 object key.
             
         Returns:
-            Parsed JSON content or None if not found.
+            Object bytes, or None if not found or the read failed. Only a
+            missing object is remembered in the negative cache; throttling
+            and other errors are retried on the next call.
         """
+        if key in self._neg_cache:
+            return None
         try:
-            s3 = self._get_s3_client()
-            
-            # Run S3 operation in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: s3.get_object(
-                    Bucket=self.settings.s3_predictions_bucket,
-                    Key=key,
-                ),
+            s3 = await self._get_s3_client()
+            response = await s3.get_object(
+                Bucket=self.settings.s3_predictions_bucket,
+                Key=key,
             )
-            
-            body = response["Body"].read()
-            return json.loads(body)
+            return await self._read_body(response)
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
             if error_code == "NoSuchKey":
-                logger.warning(f"S3 object not found: {key}")
+                logger.warning("S3 object not found: %s", key)
+                self._neg_cache[key] = True
             else:
-                logger.error(f"S3 error reading {key}: {e}")
+                logger.error("S3 error reading %s: %s", key, e)
             return None
+
+    @staticmethod
+    def _parse_body(body: Optional[bytes], key: str) -> Optional[Dict[str, Any]]:
+        """Decode a msgpack or JSON object body, returning None if missing or invalid."""
+        if body is None:
+            return None
+        if key.endswith(".msgpack"):
+            try:
+                return msgpack.unpackb(body, raw=False)
+            except (msgpack.UnpackException, ValueError) as e:
+                logger.error("Invalid msgpack in object %s: %s", key, e)
+                return None
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            pass
+        # orjson rejects the NaN/Infinity literals Python's json.dumps can
+        # emit for float fields; the stdlib parser accepts them
+        try:
+            return json.loads(body)
         except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in S3 object {key}: {e}")
+            logger.error("Invalid JSON in object %s: %s", key, e)
             return None
 
+    async def _read_s3_object(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Read and decode a JSON or msgpack object from S3.
+        
+        Args:
+            key: S3 object key.
+            
+        Returns:
+            Parsed JSON content or None if not found.
+        """
+        return self._parse_body(await self._read_s3_bytes(key), key)
+
+    def _cache_for(self, cache_key: str) -> TTLCache:
+        """Return the cache that holds entries for the given key."""
+        return self._game_cache if cache_key.startswith("game:") else self._latest_cache
+
+    async def _get_or_fetch(
+        self,
+        cache_key: str,
+        fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return a cached value, or fetch it once for all concurrent callers.
+        
+        The first miss for a key starts the fetch as a task; later misses
+        for the same key await that task instead of issuing their own read.
+        Distinct keys fetch in parallel. Only truthy results are cached.
+        
+        Args:
+            cache_key: Key in the in-memory cache.
+            fetch: Coroutine function that loads the value on a miss.
+            
+        Returns:
+            The cached or freshly fetched value, or None if unavailable.
+        """
+        cache = self._cache_for(cache_key)
+        if cache_key in cache:
+            return cache[cache_key]
+        
+        # No await between the lookup and the insert, so no lock is needed
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_into_cache(cache_key, fetch))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        
+        # Shielded so one cancelled request doesn't fail the others waiting
+        return await asyncio.shield(task)
+
+    async def _fetch_into_cache(
+        self,
+        cache_key: str,
+        fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """Run a fetch and cache a non-empty result."""
+        data = await fetch()
+        if data:
+            self._cache_for(cache_key)[cache_key] = data
+        return data
+
+    async def _fetch_latest(self) -> Optional[Dict[str, Any]]:
+        """Load latest predictions from the shared cache, falling back to S3."""
+        # Another worker may have fetched it already
+        body = await redis_get(self._latest_redis_key)
+        if body is not None:
+            return self._parse_body(body, self._latest_key)
+        
+        body = await self._read_s3_bytes(self._latest_key)
+        data = self._parse_body(body, self._latest_key)
+        if data:
+            await redis_set(self._latest_redis_key, bytes(body), LATEST_CACHE_TTL)
+            logger.info("Cached latest predictions from S3")
+        return data
+
+    async def _refresh_latest(self) -> None:
+        """
+        Re-read the latest predictions object into the cache ahead of expiry.
+        
+        Sends the last seen ETag as If-None-Match, so an unchanged object
+        costs a 304 and re-arms the cached copy without downloading or
+        re-parsing it.
+        """
+        cached = self._latest_cache.get("latest")
+        params = {"Bucket": self.settings.s3_predictions_bucket, "Key": self._latest_key}
+        if cached and self._latest_etag:
+            params["IfNoneMatch"] = self._latest_etag
+        
+        try:
+            s3 = await self._get_s3_client()
+            response = await s3.get_object(**params)
+            body = await self._read_body(response)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("304", "NotModified"):
+                # Reassigning resets the entry's TTL
+                self._latest_cache["latest"] = cached
+            else:
+                logger.error("S3 error refreshing %s: %s", self._latest_key, e)
+            return
+        
+        data = self._parse_body(body, self._latest_key)
+        if data:
+            self._latest_cache["latest"] = data
+            self._neg_cache.pop(self._latest_key, None)
+            self._latest_etag = response.get("ETag")
+            await redis_set(self._latest_redis_key, bytes(body), LATEST_CACHE_TTL)
+            logger.info("Refreshed latest predictions from S3")
+
+    async def refresh_latest_loop(self) -> None:
+        """
+        Keep latest predictions warm for the life of the process.
+        
+        Run as a background task from the app lifespan; S3 traffic for
+        the latest object becomes one conditional GET per interval per worker,
+        independent of request volume.
+        """
+        while True:
+            try:
+                await self._refresh_latest()
+            except Exception:
+                logger.exception("Failed to refresh latest predictions")
+            await asyncio.sleep(LATEST_REFRESH_INTERVAL)
+
     async def get_latest_predictions(self) -> Optional[Dict[str, Any]]:
         """
         Get the latest predictions from S3.
         
-        Reads from latest.json in the predictions bucket.
+        Reads from latest.json (or latest.msgpack) in the predictions bucket.
         Uses caching to minimize S3 requests.
         
         Returns:
             Prediction data matching BackendPredictionResponse schema,
             or None if unavailable.
         """
-        cache_key = "latest"
+        return await self._get_or_fetch("latest", self._fetch_latest)
+
+    async def get_latest_predictions_bytes(self) -> Optional[Tuple[bytes, str]]:
+        """
+        Get the latest predictions as ready-to-send JSON bytes and an ETag.
         
-        # Check cache first
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-        
-        # Fetch from S3
-        async with self._lock:
-            # Double-check cache after acquiring lock
-            if cache_key in self._cache:
-                return self._cache[cache_key]
-            
-            data = await self._read_s3_object("latest.json")
-            
-            if data:
-                self._cache[cache_key] = data
-                logger.info("Cached latest predictions from S3")
-            
-            return data
+        The payload is serialized and hashed once per distinct predictions
+        object and reused until the cached predictions change, so serving
+        it is a lookup rather than a JSON encode per request.
+        
+        Returns:
+            Tuple of JSON-encoded BackendPredictionResponse and its quoted
+            strong ETag, or None if unavailable.
+        """
+        data = await self.get_latest_predictions()
+        if not data:
+            return None
+        
+        # Keyed to the dict it was encoded from, so a refresh can't leave
+        # stale bytes behind
+        entry = self._latest_cache.get("latest:json")
+        if entry is None or entry[0] is not data:
+            body = orjson.dumps(data)
+            etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            entry = (data, body, etag)
+            self._latest_cache["latest:json"] = entry
+        return entry[1], entry[2]
+
+    @staticmethod
+    def _project_free_tier(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Project game detail data down to the free tier view.
+        
+        Free tier gets basic predictions only — no player impact,
+        no scenario analysis, no prediction history.
+        """
+        predictions = data.get("predictions") or {}
+        return {
+            "prediction_id": data.get("prediction_id"),
+            "game_id": data.get("game_id"),
+            "prediction_timestamp": data.get("prediction_timestamp"),
+            "teams": data.get("teams"),
+            "predictions": {
+                "final_spread": predictions.get("final_spread"),
+                "final_total": predictions.get("final_total"),
+                "final_home_win_prob": predictions.get("final_home_win_prob"),
+                "confidence": predictions.get("confidence"),
+            },
+            "context": data.get("context"),
+        }
 
-    async def get_game_detail(self, game_id: str) -> Optional[Dict[str, Any]]:
+    def _game_detail_s3_key(self, game_id: str) -> str:
+        """Build the S3 key for a game, sanitizing it against path traversal."""
+        if _UNSAFE_GAME_ID.search(game_id):
+            game_id = game_id.translate(_GAME_ID_SANITIZE).replace("..", "_")
+        return f"game_details/{game_id}.{self._ext}"
+
+    async def get_game_detail(
+        self,
+        game_id: str,
+        tier: str = "premium",
+    ) -> Optional[Dict[str, Any]]:
         """
         Get detailed predictions for a specific game.
         
         Reads from game_details/{game_id}.json in the predictions bucket.
+        The free tier view is projected once and cached alongside the full
+        document, so repeat free-tier reads skip the projection entirely.
         
         Args:
             game_id: The game identifier (e.g., "PHI@MEM_2025-12-30").
                      May be URL-encoded (e.g., "PHI%40MEM_2025-12-30").
+            tier: "premium" for the full document, "free" for basic
+                  predictions only.
             
         Returns:
-            Game detail data matching BackendGameDetailFile schema,
-            or None if not found.
+            Game detail data matching BackendGameDetailFile schema (or its
+            free tier subset), or None if not found.
         """
         # URL-decode the game_id in case it's encoded (e.g., %40 -> @)
         decoded_game_id = unquote(game_id)
         
         cache_key = f"game:{decoded_game_id}"
+        free_key = f"{cache_key}:free"
         
         # Check cache first
-        if cache_key in self._cache:
-            return self._cache[cache_key]
-        
-        # Sanitize game_id to prevent path traversal
-        safe_game_id = decoded_game_id.replace("/", "_").replace("\\", "_").replace("..", "_")
+        if tier == "free" and free_key in self._game_cache:
+            return self._game_cache[free_key]
         
-        # Fetch from S3
-        data = await self._read_s3_object(f"game_details/{safe_game_id}.json")
+        data = await self._get_or_fetch(
+            cache_key,
+            lambda: self._read_s3_object(self._game_detail_s3_key(decoded_game_id)),
+        )
         
-        if data:
-            self._cache[cache_key] = data
-            logger.debug(f"Cached game detail: {decoded_game_id}")
+        if data and tier == "free":
+            data = self._project_free_tier(data)
+            self._game_cache[free_key] = data
         
         return data
 
-    async def get_meta(self) -> Dict[str, Any]:
+    async def get_game_details_bulk(
+        self,
+        game_ids: List[str],
+        tier: str = "premium",
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Get detailed predictions for several games at once.
+        
+        Cache misses are fetched from S3 concurrently. S3 has no multi-object
+        GET, and game detail files are small (~10 KiB), so per-request
+        latency dominates transfer time; overlapping the GETs amortizes it.
+        
+        Args:
+            game_ids: Game identifiers, as accepted by get_game_detail.
+            tier: "premium" for full documents, "free" for basic predictions.
+            
+        Returns:
+            Dict mapping each requested game_id to its detail, or None if
+            the game was not found.
+        """
+        unique_ids = list(dict.fromkeys(game_ids))
+        details = await asyncio.gather(
+            *(self.get_game_detail(game_id, tier=tier) for game_id in unique_ids)
+        )
+        return dict(zip(unique_ids, details))
+
+    async def get_meta(self) -> Mapping[str, Any]:
         """
         Get model metadata from the latest predictions.
         
+        The meta dict is built once per predictions object and reused until
+        the cached predictions change. Callers must not mutate it.
+        
         Returns:
-            Dict with model_version, last_run, and odds_updated timestamps.
+            Mapping with model_version, last_run, and odds_updated timestamps.
         """
         predictions = await self.get_latest_predictions()
         
-        if predictions and "meta" in predictions:
-            meta = predictions["meta"]
-            return {
-                "model_version": meta.get("model_version", "unknown"),
-                "last_run": meta.get("generated_at", ""),
-                "odds_updated": meta.get("data_freshness", ""),
-                "feature_count": meta.get("feature_count", 0),
-                "training_games": meta.get("training_games", 0),
-                "training_seasons": meta.get("training_seasons", []),
-                "api_version": meta.get("api_version", "1.0.0"),
-            }
+        if not predictions or "meta" not in predictions:
+            return DEFAULT_META
         
-        return {
-            "model_version": "unknown",
-            "last_run": "",
-            "odds_updated": "",
-            "feature_count": 0,
-            "training_games": 0,
-            "training_seasons": [],
-            "api_version": "1.0.0",
-        }
+        entry = self._latest_cache.get("meta")
+        if entry is None or entry[0] is not predictions:
+            meta = predictions["meta"]
+            entry = (
+                predictions,
+                {
+                    "model_version": meta.get("model_version", "unknown"),
+                    "last_run": meta.get("generated_at", ""),
+                    "odds_updated": meta.get("data_freshness", ""),
+                    "feature_count": meta.get("feature_count", 0),
+                    "training_games": meta.get("training_games", 0),
+                    "training_seasons": meta.get("training_seasons", []),
+                    "api_version": meta.get("api_version", "1.0.0"),
+                },
+            )
+            self._latest_cache["meta"] = entry
+        return entry[1]
 
-    def log_prediction_access(
+    async def log_prediction_access(
         self,
         user_id: str,
         game_id: Optional[str] = None,
@@ -190,18 +494,23 @@ class PredictionService:
         """
         Log prediction access for auditing.
         
+        A coroutine so that, queued as a background task, it runs on the
+        event loop instead of taking a threadpool hop for one log line.
+        
         Args:
             user_id: The user accessing predictions.
             game_id: Optional specific game being accessed.
             endpoint: The endpoint being accessed.
         """
+        if not logger.isEnabledFor(logging.INFO):
+            return
         timestamp = datetime.now(timezone.utc).isoformat()
         logger.info(
-            f"PREDICTION_ACCESS | "
-            f"user_id={user_id} | "
-            f"endpoint={endpoint} | "
-            f"game_id={game_id or 'N/A'} | "
-            f"timestamp={timestamp}"
+            "PREDICTION_ACCESS | user_id=%s | endpoint=%s | game_id=%s | timestamp=%s",
+            user_id,
+            endpoint,
+            game_id or "N/A",
+            timestamp,
         )
 
     async def invalidate_cache(self, key: Optional[str] = None) -> None:
@@ -212,10 +521,22 @@ class PredictionService:
             key: Specific cache key to invalidate, or None to clear all.
         """
         if key:
-            self._cache.pop(key, None)
-            logger.info(f"Invalidated cache key: {key}")
+            cache = self._cache_for(key)
+            cache.pop(key, None)
+            # Entries derived from this one would otherwise outlive it
+            if key == "latest":
+                cache.pop("latest:json", None)
+                cache.pop("meta", None)
+            elif key.startswith("game:"):
+                cache.pop(f"{key}:free", None)
+            # Keyed by S3 key rather than cache key, and only held for
+            # seconds, so drop it all rather than map one to the other
+            self._neg_cache.clear()
+            logger.info("Invalidated cache key: %s", key)
         else:
-            self._cache.clear()
+            self._latest_cache.clear()
+            self._game_cache.clear()
+            self._neg_cache.clear()
             logger.info("Cleared all prediction cache")
 
 
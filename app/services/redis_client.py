@@ -0,0 +1,73 @@
+"""
+Optional shared Redis cache.
+
+Redis is only used when REDIS_URL is set. Every helper degrades to a
+no-op (returns None) when Redis is unconfigured or unreachable, so
+callers always keep working on their process-local fallback.
+"""
+
+import logging
+from typing import Optional, Union
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[Redis] = None
+
+
+def get_redis() -> Optional[Redis]:
+    """Get the shared Redis client, or None if REDIS_URL is not configured."""
+    global _client
+    if _client is None:
+        redis_url = get_settings().redis_url
+        if not redis_url:
+            return None
+        _client = Redis.from_url(redis_url, socket_timeout=1.0)
+    return _client
+
+
+async def redis_get(key: str) -> Optional[bytes]:
+    """Read a key; None on miss, when disabled, or on Redis errors."""
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return await client.get(key)
+    except RedisError as e:
+        logger.warning("Redis GET %s failed: %s", key, e)
+        return None
+
+
+async def redis_set(
+    key: str,
+    value: Union[bytes, str],
+    ttl: int,
+    nx: bool = False,
+) -> Optional[bool]:
+    """
+    Write a key with a TTL in seconds.
+    
+    Returns:
+        True if written, False if nx=True and the key already existed,
+        None when Redis is disabled or the write failed.
+    """
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        return bool(await client.set(key, value, ex=ttl, nx=nx))
+    except RedisError as e:
+        logger.warning("Redis SET %s failed: %s", key, e)
+        return None
+
+
+async def close_redis() -> None:
+    """Close the shared Redis client."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -8,12 +8,13 @@ Handles:
 - Processing webhooks
 """
 
+import asyncio
 import logging
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 import stripe
-from sqlalchemy import select
+from sqlalchemy import func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
@@ -22,6 +23,17 @@ from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
+# Stripe subscription status -> internal status
+_STATUS_MAP = {
+    "trialing": "trialing",
+    "active": "active",
+    "past_due": "past_due",
+    "canceled": "canceled",
+    "unpaid": "past_due",
+    "incomplete": "trialing",
+    "incomplete_expired": "expired",
+}
+
 
 class StripeService:
     """
@@ -29,60 +41,59 @@ class StripeService:
     
     Manages customer creation, checkout sessions, portal sessions,
     and webhook processing for subscription lifecycle events.
+    
+    The Stripe SDK is synchronous, so API calls run in worker threads via
+    asyncio.to_thread to keep the event loop free during the round trip.
     """
 
     def __init__(self):
         self.settings = get_settings()
         stripe.api_key = self.settings.stripe_secret_key
-
-    async def create_customer(self, email: str, user_id: str) -> str:
-        """
-        Create a Stripe customer.
-        
-        Args:
-            email: Customer's email address.
-            user_id: Internal user ID for metadata.
-            
-        Returns:
-            Stripe customer ID.
-        """
-        try:
-            customer = stripe.Customer.create(
-                email=email,
-                metadata={"user_id": user_id},
-            )
-            logger.info(f"Created Stripe customer: {customer.id}")
-            return customer.id
-        except stripe.StripeError as e:
-            logger.error(f"Failed to create Stripe customer: {e}")
-            raise
+        # Price ID -> plan, built once; unconfigured (empty) price IDs are
+        # left out so they can never match
+        price_plans = (
+            (self.settings.stripe_weekly_price_id, "pro_weekly"),
+            (self.settings.stripe_monthly_price_id, "pro_monthly"),
+            (self.settings.stripe_season_price_id, "pro_season"),
+            (self.settings.stripe_data_api_price_id, "data_api"),
+            (self.settings.stripe_premium_price_id, "pro_monthly"),  # backwards compat
+        )
+        self._price_plan_map: Dict[str, str] = {
+            price_id: plan for price_id, plan in price_plans if price_id
+        }
 
     async def create_checkout_session(
         self,
-        customer_id: str,
+        customer_id: Optional[str],
         price_id: str,
         success_url: str,
         cancel_url: str,
         mode: str = "subscription",
         trial_days: Optional[int] = None,
+        customer_email: Optional[str] = None,
+        client_reference_id: Optional[str] = None,
     ) -> str:
         """
         Create a Stripe checkout session.
 
+        Without a customer_id, Stripe creates the customer itself when the
+        checkout completes, saving a separate Customer.create round trip.
+
         Args:
-            customer_id: Stripe customer ID.
+            customer_id: Existing Stripe customer ID, or None for new customers.
             price_id: Stripe price ID for the subscription.
             success_url: URL to redirect to on success.
             cancel_url: URL to redirect to on cancellation.
             mode: "subscription" or "payment" (one-time).
             trial_days: Optional number of trial days (subscription mode only).
+            customer_email: Prefilled email for a new customer.
+            client_reference_id: Internal user ID, echoed back in the webhook.
 
         Returns:
             Checkout session URL.
         """
         try:
             session_params: Dict[str, Any] = {
-                "customer": customer_id,
                 "payment_method_types": ["card"],
                 "line_items": [
                     {
@@ -95,12 +106,25 @@ class StripeService:
                 "cancel_url": cancel_url,
             }
 
+            if client_reference_id:
+                session_params["client_reference_id"] = client_reference_id
+
+            if customer_id:
+                session_params["customer"] = customer_id
+            else:
+                if customer_email:
+                    session_params["customer_email"] = customer_email
+                if mode == "payment":
+                    # Subscription mode always creates a customer; payment
+                    # mode only does so when asked
+                    session_params["customer_creation"] = "always"
+
             if mode == "subscription" and trial_days and trial_days > 0:
                 session_params["subscription_data"] = {
                     "trial_period_days": trial_days,
                 }
 
-            session = stripe.checkout.Session.create(**session_params)
+            session = await asyncio.to_thread(stripe.checkout.Session.create, **session_params)
             logger.info(f"Created checkout session: {session.id} (mode={mode})")
             return session.url
         except stripe.StripeError as e:
@@ -123,7 +147,8 @@ class StripeService:
             Portal session URL.
         """
         try:
-            session = stripe.billing_portal.Session.create(
+            session = await asyncio.to_thread(
+                stripe.billing_portal.Session.create,
                 customer=customer_id,
                 return_url=return_url,
             )
@@ -172,6 +197,8 @@ class StripeService:
 
         Updates the user's subscription with Stripe IDs and status.
         Supports both subscription and one-time payment (season pass) modes.
+        Sessions carry our user ID as client_reference_id, which also links
+        customers that Stripe created during checkout.
 
         Args:
             event: Stripe webhook event data.
@@ -181,18 +208,7 @@ class StripeService:
         customer_id = session["customer"]
         subscription_id = session.get("subscription")
         mode = session.get("mode", "subscription")
-
-        # Find user by Stripe customer ID
-        result = await db.execute(
-            select(Subscription).where(
-                Subscription.stripe_customer_id == customer_id
-            )
-        )
-        subscription = result.scalar_one_or_none()
-
-        if not subscription:
-            logger.warning(f"No subscription found for customer: {customer_id}")
-            return
+        client_reference_id = session.get("client_reference_id")
 
         if mode == "payment":
             # One-time payment (season pass)
@@ -201,36 +217,52 @@ class StripeService:
                 # line_items may not be expanded; determine from metadata or default to season
                 price_id = self.settings.stripe_season_price_id
             plan = self._price_to_plan(price_id)
-            subscription.plan = plan
-            subscription.status = "active"
-            # Season pass expires at end of NBA Finals (~June 30, 2026)
-            subscription.current_period_end = datetime(2026, 6, 30, tzinfo=timezone.utc)
-            logger.info(f"Activated season pass for customer: {customer_id}, plan={plan}")
+            values: Dict[str, Any] = {
+                "plan": plan,
+                "status": "active",
+                # Season pass expires at end of NBA Finals (~June 30, 2026)
+                "current_period_end": datetime(2026, 6, 30, tzinfo=timezone.utc),
+            }
         else:
             # Recurring subscription
             if not subscription_id:
                 logger.warning("Subscription checkout completed without subscription ID")
                 return
 
-            stripe_sub = stripe.Subscription.retrieve(subscription_id)
-            price_id = stripe_sub["items"]["data"][0]["price"]["id"]
-            plan = self._price_to_plan(price_id)
+            stripe_sub = await asyncio.to_thread(stripe.Subscription.retrieve, subscription_id)
+            values = self._subscription_values(stripe_sub)
+            values["stripe_subscription_id"] = subscription_id
+            plan = values["plan"]
 
-            subscription.stripe_subscription_id = subscription_id
-            subscription.plan = plan
-            subscription.status = self._stripe_status_to_internal(stripe_sub["status"])
-            subscription.current_period_end = datetime.fromtimestamp(
-                stripe_sub["current_period_end"],
-                tz=timezone.utc,
+        # Find the subscription by user ID, or by Stripe customer ID for
+        # sessions created without a client_reference_id
+        if client_reference_id:
+            condition = Subscription.user_id == client_reference_id
+        else:
+            condition = Subscription.stripe_customer_id == customer_id
+        if customer_id:
+            # Link customers Stripe created during checkout, keeping any
+            # existing ID
+            values["stripe_customer_id"] = func.coalesce(
+                Subscription.stripe_customer_id, customer_id
             )
-            if stripe_sub.get("trial_end"):
-                subscription.trial_ends_at = datetime.fromtimestamp(
-                    stripe_sub["trial_end"],
-                    tz=timezone.utc,
-                )
-            logger.info(f"Updated subscription for customer: {customer_id}, plan={plan}")
+
+        result = await db.execute(
+            update(Subscription)
+            .where(condition)
+            .values(**values)
+            .returning(Subscription.id)
+            .execution_options(synchronize_session=False)
+        )
+        if result.first() is None:
+            logger.warning(f"No subscription found for customer: {customer_id}")
+            return
 
         await db.commit()
+        if mode == "payment":
+            logger.info(f"Activated season pass for customer: {customer_id}, plan={plan}")
+        else:
+            logger.info(f"Updated subscription for customer: {customer_id}, plan={plan}")
 
     async def handle_subscription_updated(
         self,
@@ -250,26 +282,14 @@ class StripeService:
         subscription_id = stripe_sub["id"]
         
         result = await db.execute(
-            select(Subscription).where(
-                Subscription.stripe_subscription_id == subscription_id
-            )
+            update(Subscription)
+            .where(Subscription.stripe_subscription_id == subscription_id)
+            .values(**self._subscription_values(stripe_sub))
+            .returning(Subscription.id)
+            .execution_options(synchronize_session=False)
         )
-        subscription = result.scalar_one_or_none()
         
-        if subscription:
-            price_id = stripe_sub["items"]["data"][0]["price"]["id"]
-            subscription.plan = self._price_to_plan(price_id)
-            subscription.status = self._stripe_status_to_internal(stripe_sub["status"])
-            subscription.current_period_end = datetime.fromtimestamp(
-                stripe_sub["current_period_end"],
-                tz=timezone.utc,
-            )
-            if stripe_sub.get("trial_end"):
-                subscription.trial_ends_at = datetime.fromtimestamp(
-                    stripe_sub["trial_end"],
-                    tz=timezone.utc,
-                )
-            
+        if result.first() is not None:
             await db.commit()
             logger.info(f"Updated subscription: {subscription_id}")
         else:
@@ -293,32 +313,40 @@ class StripeService:
         subscription_id = stripe_sub["id"]
         
         result = await db.execute(
-            select(Subscription).where(
-                Subscription.stripe_subscription_id == subscription_id
-            )
+            update(Subscription)
+            .where(Subscription.stripe_subscription_id == subscription_id)
+            .values(status="canceled", plan="free")
+            .returning(Subscription.id)
+            .execution_options(synchronize_session=False)
         )
-        subscription = result.scalar_one_or_none()
         
-        if subscription:
-            subscription.status = "canceled"
-            subscription.plan = "free"
-            
+        if result.first() is not None:
             await db.commit()
             logger.info(f"Canceled subscription: {subscription_id}")
         else:
             logger.warning(f"No subscription found for Stripe sub: {subscription_id}")
 
+    def _subscription_values(self, stripe_sub: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a Stripe subscription to the columns we sync from it."""
+        price_id = stripe_sub["items"]["data"][0]["price"]["id"]
+        values: Dict[str, Any] = {
+            "plan": self._price_to_plan(price_id),
+            "status": self._stripe_status_to_internal(stripe_sub["status"]),
+            "current_period_end": datetime.fromtimestamp(
+                stripe_sub["current_period_end"],
+                tz=timezone.utc,
+            ),
+        }
+        if stripe_sub.get("trial_end"):
+            values["trial_ends_at"] = datetime.fromtimestamp(
+                stripe_sub["trial_end"],
+                tz=timezone.utc,
+            )
+        return values
+
     def _price_to_plan(self, price_id: str) -> str:
         """Map Stripe price ID to internal plan name."""
-        price_plan_map = {
-            self.settings.stripe_weekly_price_id: "pro_weekly",
-            self.settings.stripe_monthly_price_id: "pro_monthly",
-            self.settings.stripe_season_price_id: "pro_season",
-            self.settings.stripe_data_api_price_id: "data_api",
-            self.settings.stripe_premium_price_id: "pro_monthly",  # backwards compat
-        }
-        # Filter out empty keys (unconfigured price IDs)
-        plan = price_plan_map.get(price_id) if price_id else None
+        plan = self._price_plan_map.get(price_id)
         if plan:
             return plan
         logger.warning(f"Unknown price ID: {price_id}")
@@ -326,16 +354,7 @@ class StripeService:
 
     def _stripe_status_to_internal(self, stripe_status: str) -> str:
         """Map Stripe subscription status to internal status."""
-        status_map = {
-            "trialing": "trialing",
-            "active": "active",
-            "past_due": "past_due",
-            "canceled": "canceled",
-            "unpaid": "past_due",
-            "incomplete": "trialing",
-            "incomplete_expired": "expired",
-        }
-        return status_map.get(stripe_status, "expired")
+        return _STATUS_MAP.get(stripe_status, "expired")
 
 
 # Global service instance
@@ -1,45 +1,77 @@
 #!/usr/bin/env python3
-"""Check subscription statuses for all users."""
+"""Check subscription statuses for all users.
+
+Pass --summary to print only the tier counts (computed in SQL) and skip
+the per-user listing.
+"""
 
 import asyncio
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+import sys
+
+from sqlalchemy import and_, func, select
 
 from app.db.database import async_session_maker
 from app.models.user import User
 from app.models.subscription import Subscription
 
-async def check_subscriptions():
+# Fixed-width listing row, bound once
+_format_row = "{:<40} {:<10} {:<12} {:<8}\n".format
+
+async def check_subscriptions(summary_only: bool = False):
     """Check subscription statuses."""
+    has_premium = and_(
+        Subscription.status.in_(Subscription.ACTIVE_STATUSES),
+        Subscription.plan.in_(Subscription.PREMIUM_PLANS),
+    )
+    
     async with async_session_maker() as session:
-        # Get all users with their subscriptions
-        result = await session.execute(
-            select(User)
-            .options(selectinload(User.subscription))
-        )
-        users = result.scalars().all()
-        
-        print("=" * 80)
-        print("User Subscription Status")
-        print("=" * 80)
-        print(f"{'Email':<40} {'Plan':<10} {'Status':<12} {'Premium':<8}")
-        print("-" * 80)
-        
-        for user in users:
-            if user.subscription:
-                sub = user.subscription
-                print(f"{user.email:<40} {sub.plan:<10} {sub.status:<12} {str(sub.has_premium_access):<8}")
-            else:
-                print(f"{user.email:<40} {'None':<10} {'No Sub':<12} {'False':<8}")
-        
-        print("=" * 80)
-        print(f"\nTotal users: {len(users)}")
+        if not summary_only:
+            # Stream plain columns in batches instead of materializing every
+            # User and Subscription object up front
+            result = await session.stream(
+                select(
+                    User.email,
+                    Subscription.plan,
+                    Subscription.status,
+                    func.coalesce(has_premium, False).label("premium"),
+                )
+                .select_from(User)
+                .outerjoin(Subscription, Subscription.user_id == User.id)
+                .execution_options(yield_per=500)
+            )
+            
+            print("=" * 80)
+            print("User Subscription Status")
+            print("=" * 80)
+            print(f"{'Email':<40} {'Plan':<10} {'Status':<12} {'Premium':<8}")
+            print("-" * 80)
+            
+            # One write per streamed batch rather than a print per user
+            async for rows in result.partitions():
+                sys.stdout.write("".join(
+                    _format_row(row.email, row.plan, row.status, str(row.premium))
+                    if row.plan is not None
+                    else _format_row(row.email, "None", "No Sub", "False")
+                    for row in rows
+                ))
+            
+            print("=" * 80)
         
-        premium_count = sum(1 for u in users if u.subscription and u.subscription.has_premium_access)
-        free_count = len(users) - premium_count
+        # Let Postgres do the counting instead of walking every row in Python
+        counts = (
+            await session.execute(
+                select(
+                    func.count(User.id).label("total"),
+                    func.count(User.id).filter(has_premium).label("premium"),
+                )
+                .select_from(User)
+                .outerjoin(Subscription, Subscription.user_id == User.id)
+            )
+        ).one()
         
-        print(f"Free tier: {free_count}")
-        print(f"Premium tier: {premium_count}")
+        print(f"\nTotal users: {counts.total}")
+        print(f"Free tier: {counts.total - counts.premium}")
+        print(f"Premium tier: {counts.premium}")
 
 if __name__ == "__main__":
-    asyncio.run(check_subscriptions())
+    asyncio.run(check_subscriptions(summary_only="--summary" in sys.argv))
@@ -0,0 +1,26 @@
+-- Unique (user_id, coupon_code) index on coupon_redemptions.
+--
+-- redeem_coupon records redemptions with
+--   INSERT ... ON CONFLICT (user_id, coupon_code) DO NOTHING
+-- which Postgres rejects unless this index exists. Until it does, the API
+-- falls back to checking for a prior redemption before inserting.
+--
+-- Run with psql outside a transaction (CREATE INDEX CONCURRENTLY cannot
+-- run inside one):
+--   psql -v ON_ERROR_STOP=1 -f database/migrations/006_coupon_redemption_unique.sql
+--
+-- If the index build fails (e.g. a duplicate slipped in between the two
+-- statements), it is left INVALID and the API keeps using the fallback.
+-- Drop it and run this file again:
+--   DROP INDEX CONCURRENTLY IF EXISTS ix_coupon_redemption_user_code;
+
+-- Keep the earliest redemption of each (user_id, coupon_code); the index
+-- build fails while duplicates remain
+DELETE FROM coupon_redemptions r
+USING coupon_redemptions d
+WHERE r.user_id = d.user_id
+  AND r.coupon_code = d.coupon_code
+  AND (r.redeemed_at, r.id) > (d.redeemed_at, d.id);
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_coupon_redemption_user_code
+    ON coupon_redemptions (user_id, coupon_code);
@@ -0,0 +1,13 @@
+-- Partial index for "currently valid coupon" scans (Coupon.valid_filter()),
+-- skipping inactive coupons entirely.
+--
+-- Run with psql outside a transaction (CREATE INDEX CONCURRENTLY cannot
+-- run inside one):
+--   psql -v ON_ERROR_STOP=1 -f database/migrations/007_coupons_active_valid_index.sql
+--
+-- If the build fails it is left INVALID; drop it and run this file again:
+--   DROP INDEX CONCURRENTLY IF EXISTS ix_coupons_active_valid;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_coupons_active_valid
+    ON coupons (expires_at)
+    WHERE is_active = true;
@@ -0,0 +1,16 @@
+"""
+Shared test setup.
+
+Settings are loaded at import time, so the required values are set here
+before any app module is imported.
+"""
+
+import os
+
+os.environ.setdefault("COGNITO_USER_POOL_ID", "us-east-1_test")
+os.environ.setdefault("COGNITO_CLIENT_ID", "test-client")
+os.environ.setdefault("STRIPE_SECRET_KEY", "sk_test_dummy")
+os.environ.setdefault("STRIPE_WEBHOOK_SECRET", "whsec_dummy")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+os.environ["REDIS_URL"] = ""
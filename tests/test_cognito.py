@@ -0,0 +1,77 @@
+"""CognitoService JWKS handling across a Cognito key rotation."""
+
+import asyncio
+import json
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from app.services.cognito import CognitoService
+
+
+def make_key(kid: str):
+    """An RSA private key and its public JWK."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update(kid=kid, alg="RS256", use="sig")
+    return private_key, jwk
+
+
+def sign(service: CognitoService, private_key, kid: str) -> str:
+    claims = {
+        "sub": "user-1",
+        "email": "a@example.com",
+        "iss": service._issuer,
+        "token_use": "id",
+        "exp": int(time.time()) + 600,
+    }
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+def service_with_jwks(*jwks):
+    """A service whose Cognito JWKS endpoint serves the given keys; counts fetches."""
+    fetches = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        fetches.append(request.url)
+        return httpx.Response(200, json={"keys": list(jwks)})
+
+    service = CognitoService()
+    service._http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return service, fetches
+
+
+def test_unknown_kid_refetches_rotated_jwks():
+    old_key, old_jwk = make_key("old")
+    new_key, new_jwk = make_key("new")
+    service, fetches = service_with_jwks(old_jwk, new_jwk)
+    # As if loaded from Redis just before Cognito rotated its keys
+    service._jwks_cache["jwks"] = service._build_key_map({"keys": [old_jwk]})
+
+    async def run():
+        claims = await service.validate_token(sign(service, new_key, "new"))
+        assert claims["sub"] == "user-1"
+        # The refreshed set still verifies tokens signed with the old key
+        await service.validate_token(sign(service, old_key, "old"))
+
+    asyncio.run(run())
+    assert len(fetches) == 1
+
+
+def test_unknown_kid_refetch_is_rate_limited():
+    _, jwk = make_key("current")
+    stranger, _ = make_key("stranger")
+    service, fetches = service_with_jwks(jwk)
+
+    async def run():
+        for _ in range(3):
+            with pytest.raises(ValueError, match="signing key"):
+                await service.validate_token(sign(service, stranger, "stranger"))
+
+    asyncio.run(run())
+    # One cold-cache fetch; the forced refetches fall inside the cooldown
+    assert len(fetches) == 1
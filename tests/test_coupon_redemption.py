@@ -0,0 +1,154 @@
+"""
+Coupon redemption statements against a real Postgres.
+
+Uses pgserver's bundled Postgres; skipped when it isn't installed.
+"""
+
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import selectinload
+
+pgserver = pytest.importorskip("pgserver")
+
+from app import models  # noqa: E402,F401  registers every table on Base
+from app.db.database import Base  # noqa: E402
+from app.models.coupon import Coupon, CouponRedemption  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.routers import billing  # noqa: E402
+from app.routers.billing import (  # noqa: E402
+    CLAIM_COUPON_USE,
+    RECORD_REDEMPTION,
+    RedeemCouponRequest,
+    redeem_coupon,
+)
+
+
+@pytest.fixture(scope="module")
+def database_url():
+    server = pgserver.get_server(tempfile.mkdtemp(), cleanup_mode="stop")
+    uri = server.get_uri()
+    yield uri.replace("postgresql://", "postgresql+asyncpg://", 1)
+    server.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def reset_index_gate(monkeypatch):
+    monkeypatch.setattr(billing, "_redemption_index_ready", False)
+
+
+@asynccontextmanager
+async def fresh_schema(database_url: str, with_unique_index: bool = True):
+    """Recreate the tables and yield a session factory bound to them."""
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        if not with_unique_index:
+            # As on databases that predate 006_coupon_redemption_unique.sql
+            await conn.execute(text("DROP INDEX ix_coupon_redemption_user_code"))
+    try:
+        yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+async def add_user_and_coupon(session_maker, email: str, **coupon) -> str:
+    async with session_maker() as db:
+        user = User(cognito_id=email, email=email)
+        db.add_all([user, Coupon(code="BETA", plan="pro_monthly", **coupon)])
+        await db.commit()
+        return user.id
+
+
+async def redeem(session_maker, user_id: str, code: str = "beta"):
+    """Call the endpoint the way get_db would: commit, or roll back on error."""
+    async with session_maker() as db:
+        user = await db.scalar(
+            select(User).options(selectinload(User.subscription)).where(User.id == user_id)
+        )
+        try:
+            return await redeem_coupon(RedeemCouponRequest(code=code), user=user, db=db)
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def count_redemptions(session_maker) -> int:
+    async with session_maker() as db:
+        return await db.scalar(select(func.count()).select_from(CouponRedemption))
+
+
+def test_record_redemption_conflict_returns_no_row(database_url):
+    async def run():
+        async with fresh_schema(database_url) as session_maker:
+            user_id = await add_user_and_coupon(session_maker, "a@example.com")
+            async with session_maker() as db:
+                params = {"user_id": user_id, "code": "BETA"}
+                first = await db.execute(RECORD_REDEMPTION, params)
+                assert first.scalar_one_or_none() is not None
+                second = await db.execute(RECORD_REDEMPTION, params)
+                assert second.scalar_one_or_none() is None
+
+    asyncio.run(run())
+
+
+def test_claim_coupon_use_stops_at_max_uses(database_url):
+    async def run():
+        async with fresh_schema(database_url) as session_maker:
+            await add_user_and_coupon(session_maker, "a@example.com", max_uses=2, current_uses=0)
+            async with session_maker() as db:
+                claims = [
+                    (await db.execute(CLAIM_COUPON_USE, {"coupon_code": "BETA"})).scalar_one_or_none()
+                    for _ in range(3)
+                ]
+            assert claims == [1, 2, None]
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("with_unique_index", [True, False])
+def test_second_redeem_is_rejected(database_url, with_unique_index):
+    async def run():
+        async with fresh_schema(database_url, with_unique_index) as session_maker:
+            user_id = await add_user_and_coupon(session_maker, "a@example.com")
+            response = await redeem(session_maker, user_id)
+            assert response.success
+            with pytest.raises(HTTPException) as exc:
+                await redeem(session_maker, user_id)
+            assert exc.value.detail == "You have already redeemed this coupon"
+            assert await count_redemptions(session_maker) == 1
+
+    asyncio.run(run())
+    assert billing._redemption_index_ready is with_unique_index
+
+
+def test_exhausted_claim_rolls_back_the_redemption(database_url, monkeypatch):
+    async def run():
+        async with fresh_schema(database_url) as session_maker:
+            user_id = await add_user_and_coupon(
+                session_maker, "a@example.com", max_uses=1, current_uses=0
+            )
+            record_redemption = billing._record_redemption
+
+            async def record_then_lose_race(db, user_id, code):
+                recorded = await record_redemption(db, user_id, code)
+                # Another request takes the last use after this one passed
+                # the in-Python max_uses check and inserted its redemption
+                async with session_maker() as other:
+                    await other.execute(CLAIM_COUPON_USE, {"coupon_code": code})
+                    await other.commit()
+                return recorded
+
+            monkeypatch.setattr(billing, "_record_redemption", record_then_lose_race)
+            with pytest.raises(HTTPException) as exc:
+                await redeem(session_maker, user_id)
+            assert exc.value.detail == "This coupon has reached its maximum uses"
+            assert await count_redemptions(session_maker) == 0
+
+    asyncio.run(run())
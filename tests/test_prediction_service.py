@@ -0,0 +1,143 @@
+"""
+PredictionService S3 reads against a local stub of the S3 REST API.
+
+The stub is a plain aiohttp server, so reads go through a real
+aiobotocore client and StreamingBody rather than mocks.
+"""
+
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, List, Union
+
+import orjson
+from aiobotocore.config import AioConfig
+from aiohttp import web
+
+from app.services.prediction_service import PredictionService
+
+BUCKET = "predictium-predictions"
+
+NO_SUCH_KEY = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b"<Error><Code>NoSuchKey</Code><Message>The specified key does not exist.</Message></Error>"
+)
+
+SLOW_DOWN = (
+    b'<?xml version="1.0" encoding="UTF-8"?>'
+    b"<Error><Code>SlowDown</Code><Message>Please reduce your request rate.</Message></Error>"
+)
+
+
+@asynccontextmanager
+async def s3_stub(objects: Dict[str, Union[bytes, List[Union[bytes, int]]]]):
+    """
+    Serve GET /{bucket}/{key} from a dict; yields (endpoint URL, hit counts).
+    
+    A list value is served one item per request, repeating the last; an
+    int item is answered as a 503 SlowDown.
+    """
+    hits: Counter = Counter()
+
+    async def get_object(request: web.Request) -> web.Response:
+        key = request.match_info["key"]
+        body = objects.get(key)
+        if isinstance(body, list):
+            body = body[min(hits[key], len(body) - 1)]
+        hits[key] += 1
+        if isinstance(body, int):
+            return web.Response(status=503, body=SLOW_DOWN, content_type="application/xml")
+        if body is None:
+            return web.Response(status=404, body=NO_SUCH_KEY, content_type="application/xml")
+        return web.Response(body=body, headers={"ETag": '"stub-etag"'})
+
+    app = web.Application()
+    app.router.add_get(f"/{BUCKET}/{{key:.+}}", get_object)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        yield f"http://127.0.0.1:{port}", hits
+    finally:
+        await runner.cleanup()
+
+
+@asynccontextmanager
+async def service_for(endpoint: str):
+    """A PredictionService whose S3 client points at the stub."""
+    service = PredictionService()
+    async with service._session.client(
+        "s3",
+        region_name="us-east-1",
+        endpoint_url=endpoint,
+        aws_access_key_id="test",
+        aws_secret_access_key="test",
+        config=AioConfig(s3={"addressing_style": "path"}, retries={"total_max_attempts": 1}),
+    ) as s3:
+        service._s3_client = s3
+        yield service
+
+
+def test_read_s3_bytes_reads_whole_body():
+    # Larger than one read chunk, so the body arrives in several pieces
+    payload = orjson.dumps({"games": [{"game_id": str(i), "pad": "x" * 64} for i in range(2000)]})
+
+    async def run():
+        async with s3_stub({"latest.json": payload}) as (endpoint, _):
+            async with service_for(endpoint) as service:
+                body = await service._read_s3_bytes("latest.json")
+                assert bytes(body) == payload
+                assert await service._read_s3_object("latest.json") == orjson.loads(payload)
+
+    asyncio.run(run())
+
+
+def test_read_s3_bytes_missing_key_returns_none():
+    async def run():
+        async with s3_stub({}) as (endpoint, _):
+            async with service_for(endpoint) as service:
+                assert await service._read_s3_bytes("game_details/nope.json") is None
+
+    asyncio.run(run())
+
+
+def test_missing_object_is_negatively_cached():
+    async def run():
+        async with s3_stub({}) as (endpoint, hits):
+            async with service_for(endpoint) as service:
+                for _ in range(5):
+                    assert await service.get_game_detail("nope") is None
+                assert hits["game_details/nope.json"] == 1
+
+    asyncio.run(run())
+
+
+def test_transient_error_is_not_negatively_cached():
+    detail = orjson.dumps({"game_id": "flaky"})
+
+    async def run():
+        async with s3_stub({"game_details/flaky.json": [503, detail]}) as (endpoint, hits):
+            async with service_for(endpoint) as service:
+                assert await service.get_game_detail("flaky") is None
+                assert await service.get_game_detail("flaky") == {"game_id": "flaky"}
+                assert hits["game_details/flaky.json"] == 2
+
+    asyncio.run(run())
+
+
+def test_invalidating_a_game_drops_its_free_tier_view():
+    old = orjson.dumps({"game_id": "g1", "predictions": {"final_spread": -3.5}})
+    new = orjson.dumps({"game_id": "g1", "predictions": {"final_spread": -6.0}})
+
+    async def run():
+        async with s3_stub({"game_details/g1.json": [old, new]}) as (endpoint, _):
+            async with service_for(endpoint) as service:
+                first = await service.get_game_detail("g1", tier="free")
+                assert first["predictions"]["final_spread"] == -3.5
+                await service.invalidate_cache("game:g1")
+                second = await service.get_game_detail("g1", tier="free")
+                assert second["predictions"]["final_spread"] == -6.0
+
+    asyncio.run(run())